@@ -1,9 +1,11 @@
 """Generate and save data."""
 
+import argparse
 import logging
 
 from rna_code import CACHE_PATH
 from rna_code.data.dataset_builder import DatasetBuilder
+from rna_code.data.dataset_store import export_csv, save_dataset
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -20,16 +22,26 @@ thresholds = {
 def main():
     """Handle all steps necessary to generate and save the CPTAC-3 dataset based on file
     system."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--csv", action="store_true", help="also export the dataset as CSV"
+    )
+    args = parser.parse_args()
     logger.info("Generating CPTAC-3 dataset...")
     builder = DatasetBuilder(dataset_type="CPTAC-3", selection_thresholds=thresholds)
     df, meta_data = builder.generate_dataset()
     logger.info("Saving data..")
-    data_path = CACHE_PATH / "data" / "CPTAC_3_data.csv"
-    data_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(data_path)
+    data_path = CACHE_PATH / "data" / "CPTAC_3_data.npy"
+    save_dataset(data_path, df)
+    if args.csv:
+        export_csv(data_path, data_path.with_suffix(".csv"))
     metadata_path = CACHE_PATH / "data" / "CPTAC_3_meta_data.csv"
     metadata_path.parent.mkdir(parents=True, exist_ok=True)
     meta_data.to_csv(metadata_path)
+    builder.preprocessing_artifact.save(
+        CACHE_PATH / "data" / "CPTAC_3_preprocessing.npz"
+    )
+    builder.profiler.save(CACHE_PATH / "data" / "CPTAC_3_build_report.json")
     logger.info("Done.")
 
 
@@ -3,9 +3,8 @@
 import logging
 import shutil
 
-import pandas as pd
-
 from rna_code import CACHE_PATH
+from rna_code.data.dataset_store import load_dataset, save_dataset
 from rna_code.utils.dataset_merger import DatasetMerger
 
 logging.basicConfig(
@@ -18,18 +17,16 @@ def main():
     """Take 2 existing dataset (BRCA and CPTAC-3) and create 2 new datasets in order to
     match feature number/order for consistency during transfer learning."""
     logger.info("Merging data...")
-    data_path_BRCA = CACHE_PATH / "data" / "BRCA_data.csv"
-    data_path_CPTAC_3 = CACHE_PATH / "data" / "CPTAC_3_data.csv"
-    data_BRCA = pd.read_csv(data_path_BRCA, index_col=0)
-    data_CPTAC_3 = pd.read_csv(data_path_CPTAC_3, index_col=0)
-    merged_data = DatasetMerger.intersect(data_BRCA, data_CPTAC_3)
-    data_BRCA = merged_data.loc[data_BRCA.index]
-    data_CPTAC_3 = merged_data.loc[data_CPTAC_3.index]
+    data_path_BRCA = CACHE_PATH / "data" / "BRCA_data.npy"
+    data_path_CPTAC_3 = CACHE_PATH / "data" / "CPTAC_3_data.npy"
+    data_BRCA = load_dataset(data_path_BRCA, mmap_mode="r")
+    data_CPTAC_3 = load_dataset(data_path_CPTAC_3, mmap_mode="r")
+    features = DatasetMerger.common_features(data_BRCA, data_CPTAC_3)
 
     merged_data_path = CACHE_PATH / "data_transfert_learning"
     merged_data_path.mkdir(parents=True, exist_ok=True)
-    data_BRCA.to_csv(merged_data_path / "BRCA_data.csv")
-    data_CPTAC_3.to_csv(merged_data_path / "CPTAC_3_data.csv")
+    save_dataset(merged_data_path / "BRCA_data.npy", data_BRCA[features])
+    save_dataset(merged_data_path / "CPTAC_3_data.npy", data_CPTAC_3[features])
 
     logger.info("Copying metadata...")
     files_to_copy = [
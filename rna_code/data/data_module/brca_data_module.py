@@ -14,5 +14,5 @@ class BRCADataModule(DataModuleABC):
 
         if data_dir is not None:
             self.build_from_scratch_flag : bool = False
-            self.default_data_path: Path = data_dir / "BRCA_data.csv"
+            self.default_data_path: Path = data_dir / "BRCA_data.npy"
             self.default_metadata_path: Path = data_dir / "meta_data.csv"
@@ -14,5 +14,5 @@ class CPTAC3DataModule(DataModuleABC):
 
         if data_dir is not None:
             self.build_from_scratch_flag = False
-            self.default_data_path: Path = data_dir / "CPTAC_3_data.csv"
+            self.default_data_path: Path = data_dir / "CPTAC_3_data.npy"
             self.default_metadata_path: Path = data_dir / "CPTAC_3_meta_data.csv"
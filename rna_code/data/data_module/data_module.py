@@ -25,6 +25,9 @@ from torch.utils.data import DataLoader, TensorDataset, random_split
 from rna_code import CACHE_PATH
 
 from ..dataset_builder import DatasetBuilder
+from ..dataset_store import load_dataset_array
+
+DEFAULT_MMAP_MODE = "c"
 
 
 class DataModuleABC(pl.LightningDataModule, ABC):
@@ -33,8 +36,9 @@ class DataModuleABC(pl.LightningDataModule, ABC):
     Parameters
     ----------
     data_param : dict | None, optional
-        Data parameters, can be either a dictionary containing a Path, or the
-        parameters to build the dataset from scratch, by default None
+        Data parameters, can be either a dictionary containing a Path (and optionally
+        the "mmap_mode" of the stored matrix, see `setup`), or the parameters to
+        build the dataset from scratch, by default None
     batch_size : int, optional
         Batch size, by default 32
     val_split : float, optional
@@ -78,6 +82,11 @@ class DataModuleABC(pl.LightningDataModule, ABC):
     def setup(self, stage: str):
         """Set up the data module and pre-load everything.
 
+        A stored `.npy` matrix is memory-mapped, copy-on-write by default, and a
+        float32 one is wrapped in a tensor without copy: concurrent training
+        processes then share the page cache rather than each holding the dataset.
+        A "mmap_mode" of None in data_param reads it in memory instead.
+
         Parameters
         ----------
         stage : str
@@ -90,9 +99,18 @@ class DataModuleABC(pl.LightningDataModule, ABC):
                 **self.data_param
             )
         else:
-            self.data_array = pd.read_csv(self.default_data_path, index_col=0).values
+            if self.default_data_path.suffix == ".csv":
+                self.data_array = pd.read_csv(
+                    self.default_data_path, index_col=0
+                ).to_numpy(dtype=np.float32)
+            else:
+                self.data_array = load_dataset_array(
+                    self.default_data_path,
+                    self.data_param.get("mmap_mode", DEFAULT_MMAP_MODE),
+                )
             self.meta_data = pd.read_csv(self.default_metadata_path, index_col=0)
 
+        # no copy when the matrix already is float32
         data_tensor = torch.from_numpy(self.data_array).float()
 
         self.feature_num = data_tensor.shape[1]
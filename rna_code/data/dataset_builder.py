@@ -18,16 +18,23 @@ from typing import Literal
 
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler, normalize
+import scipy.sparse as sp
 
-from rna_code.data.interface import base_interface
+from rna_code import CACHE_PATH
+from rna_code.utils.resources import StageProfiler
 
+from .feature_selection.base_feature_selector import DEFAULT_BLOCK_SIZE
+from .feature_selection.feature_statistics import feature_statistics
+from .feature_selection.hvg_selector import HVGSelector, normalized_dispersion
+from .feature_selection.score_cache import ScoreCache, matrix_fingerprint
 from .feature_selection.mad_selector import MADSelector
 from .feature_selection.expression_selector import ExpressionSelector
 from .feature_selection.laplacian_selector import LaplacianSelector
 
-from .interface.brca_interface import BRCAInterface
-from .interface.cptac_3_interface import CPTAC3Interface
+from .interface.gdc_interface import GDCInterface
+from .preprocessing_artifact import PreprocessingArtifact
+from .stage_cache import DEFAULT_STAGE_CACHE_BYTES, StageCache
+from .transformation import DEFAULT_TRANSFORMATION_DTYPE, TransformationEngine
 
 
 logging.basicConfig(
@@ -38,11 +45,21 @@ logger = logging.getLogger(__name__)
 DEFAULT_MAD_THRESHOLD = 1
 DEFAULT_LS_THRESHOLD = 0.002
 DEFAULT_EXPRESSION_THRESHOLD = None
+DEFAULT_HVG_THRESHOLD = None
 DEFAULT_NORMALIZATION = False
 DEFAULT_KEEP_ONLY_PROTEIN_CODING = False
 DEFAULT_LOG1P = True
 DEFAULT_MINMAX = True
 DEFAULT_SORTING = False
+DEFAULT_SPARSE = False
+DEFAULT_LAPLACIAN_GRAPH = "dense"
+DEFAULT_SELECTION_BLOCK_SIZE = DEFAULT_BLOCK_SIZE
+DEFAULT_SELECTION_N_JOBS = 1
+DEFAULT_SCORE_CACHE = False
+SCORE_CACHE_PATH = CACHE_PATH / "feature_scores"
+DEFAULT_STAGE_CACHE = False
+DEFAULT_OFFLINE = False
+STAGE_CACHE_PATH = CACHE_PATH / "stages"
 
 
 class DatasetBuilder:
@@ -52,7 +69,7 @@ class DatasetBuilder:
     Parameters
     ----------
     dataset_type : Literal["BRCA", "CPTAC-3"]
-        Name of the dataset to build.
+        Name of the dataset to build, one of the projects of GDC_PROJECTS.
     selection_thresholds : dict[str, float], optional
         Dictionary containing all threshold used during feature selection,
         by default None
@@ -70,14 +87,7 @@ class DatasetBuilder:
         selection_thresholds: dict[str, float] = None,
         additional_processing_steps: dict[str, bool] = None,
     ) -> None:
-        self.data_interface: base_interface
-        match dataset_type:
-            case "BRCA":
-                self.data_interface = BRCAInterface()
-            case "CPTAC-3":
-                self.data_interface = CPTAC3Interface()
-            case _:
-                raise NotImplementedError
+        self.data_interface = GDCInterface.from_project(dataset_type)
 
         if selection_thresholds is None:
             selection_thresholds = {}
@@ -90,6 +100,9 @@ class DatasetBuilder:
         self.expression_threshold = selection_thresholds.get(
             "expression_threshold", DEFAULT_EXPRESSION_THRESHOLD
         )
+        self.hvg_threshold = selection_thresholds.get(
+            "HVG_threshold", DEFAULT_HVG_THRESHOLD
+        )
 
         if additional_processing_steps is None:
             additional_processing_steps = {}
@@ -104,8 +117,40 @@ class DatasetBuilder:
         self.sort_symbols = additional_processing_steps.get(
             "sort_symbols", DEFAULT_SORTING
         )
+        self.dtype = additional_processing_steps.get(
+            "dtype", DEFAULT_TRANSFORMATION_DTYPE
+        )
+        self.sparse = additional_processing_steps.get("sparse", DEFAULT_SPARSE)
+        self.laplacian_graph = additional_processing_steps.get(
+            "laplacian_graph", DEFAULT_LAPLACIAN_GRAPH
+        )
+        self.selection_block_size = additional_processing_steps.get(
+            "selection_block_size", DEFAULT_SELECTION_BLOCK_SIZE
+        )
+        self.selection_n_jobs = additional_processing_steps.get(
+            "selection_n_jobs", DEFAULT_SELECTION_N_JOBS
+        )
+        self.score_cache = additional_processing_steps.get(
+            "score_cache", DEFAULT_SCORE_CACHE
+        )
+        self.data_interface.sparse = self.sparse
+        if additional_processing_steps.get("offline", DEFAULT_OFFLINE):
+            # annotate genes from the local store only, without querying mygene
+            self.data_interface.annotation_store.fetcher = None
+        self.stage_cache = None
+        if additional_processing_steps.get("stage_cache", DEFAULT_STAGE_CACHE):
+            self.stage_cache = StageCache(
+                STAGE_CACHE_PATH,
+                additional_processing_steps.get(
+                    "stage_cache_max_bytes", DEFAULT_STAGE_CACHE_BYTES
+                ),
+            )
+
+        self.profiler = StageProfiler()
+        self.transformation_engine: TransformationEngine | None = None
+        self.preprocessing_artifact: PreprocessingArtifact | None = None
 
-        self.data_array: np.ndarray
+        self.data_array: np.ndarray | sp.csr_matrix
         self.names: pd.DataFrame
         self.meta_data: pd.DataFrame
         self.subtypes: list[str]
@@ -113,6 +158,7 @@ class DatasetBuilder:
 
     def _build_unprocessed_component(self) -> None:
         """Builds raw dataset"""
+        self.data_interface.profiler = self.profiler
         self.data_interface.setup()
         self.data_array = self.data_interface.data_array
         self.names = self.data_interface.names
@@ -120,76 +166,346 @@ class DatasetBuilder:
         self.subtypes = self.data_interface.subtypes
         self.entry_names = self.data_interface.entry_names
 
+    def _data_shape(self) -> tuple[int, int]:
+        """Shape of the current data, for profiling."""
+        return self.data_array.shape
+
+    def _keep_genes(self, gene_selected) -> None:
+        """Keep selected columns of the data and matching gene names.
+
+        Parameters
+        ----------
+        gene_selected : array-like of bool or int
+            Selection mask or indices over the current genes.
+        """
+        gene_selected = np.asarray(gene_selected)
+        self.data_array = self.data_array[:, gene_selected]
+        self.names = self.names.iloc[gene_selected]
+
+    @staticmethod
+    def _narrow(kept: np.ndarray, gene_selected: np.ndarray, reason: str) -> np.ndarray:
+        """Apply a selection mask over the kept genes and log the removed count.
+
+        Parameters
+        ----------
+        kept : np.ndarray
+            Indices of the genes kept so far.
+        gene_selected : np.ndarray
+            Selection mask over the kept genes.
+        reason : str
+            Reason of the removal, for the log.
+
+        Returns
+        -------
+        np.ndarray
+            Indices of the genes still kept.
+        """
+        logging.info(
+            "removing %i genes %s from the dataset",
+            len(kept) - gene_selected.sum(),
+            reason,
+        )
+        return kept[gene_selected]
+
+    def _make_selector(self, selector_class, **kwargs):
+        """Build a feature selector with the block-wise and score cache settings.
+
+        Parameters
+        ----------
+        selector_class : type[ScoreBasedSelector]
+            Class of the selector.
+        **kwargs
+            Selector specific parameters.
+
+        Returns
+        -------
+        ScoreBasedSelector
+            Configured selector.
+        """
+        selector = selector_class(
+            block_size=self.selection_block_size,
+            n_jobs=self.selection_n_jobs,
+            **kwargs,
+        )
+        if self.score_cache:
+            selector.score_cache = ScoreCache(SCORE_CACHE_PATH)
+        return selector
+
     def _feature_selection(self) -> None:
-        """Perform feature selection according to selection_thresholds"""            
+        """Perform feature selection according to selection_thresholds
+
+        Filters apply in sequence (expression, highly variable genes, Laplacian
+        score, MAD, protein coding), each to the genes kept by the previous ones.
+        Expression, dispersion and MAD scores come from a single statistics pass
+        over the data, so that the dispersion filter is a cheap pre-filter (or
+        replacement) of the quadratic Laplacian one. These statistics go through the
+        score cache when it is enabled, like the Laplacian scores. Laplacian scores
+        are computed on the kept columns without copying them, and the selected
+        columns are gathered once at the end.
+        """
+        n_genes = self.data_array.shape[1]
+        kept = np.arange(n_genes)
+        statistics = None
+        if any(
+            threshold is not None
+            for threshold in [
+                self.expression_threshold,
+                self.hvg_threshold,
+                self.mad_threshold,
+            ]
+        ):
+            with self.profiler.stage("statistics", self._data_shape):
+                statistics = feature_statistics(
+                    self.data_array,
+                    self.selection_block_size,
+                    self.selection_n_jobs,
+                    ScoreCache(SCORE_CACHE_PATH) if self.score_cache else None,
+                )
+
         if self.expression_threshold is not None:
-            expression_selector = ExpressionSelector(threshold=self.expression_threshold)
-            gene_selected = expression_selector.select_features(self.data_array)
-            self.data_array = self.data_array[:, gene_selected]
-            self.names = self.names[gene_selected]
+            expression_selector = self._make_selector(
+                ExpressionSelector, threshold=self.expression_threshold
+            )
+            gene_selected = expression_selector.select_from_scores(
+                statistics["nonzero_fraction"].to_numpy()[kept]
+            )
+            kept = self._narrow(kept, gene_selected, "under the expression threshold")
+
+        if self.hvg_threshold is not None:
+            hvg_selector = self._make_selector(
+                HVGSelector, threshold=self.hvg_threshold
+            )
+            gene_selected = hvg_selector.select_from_scores(
+                normalized_dispersion(
+                    statistics["mean"].to_numpy()[kept],
+                    statistics["variance"].to_numpy()[kept],
+                    hvg_selector.n_bins,
+                )
+            )
+            kept = self._narrow(kept, gene_selected, "under the dispersion threshold")
 
         if self.ls_threshold is not None:
-            laplacian_selector = LaplacianSelector(threshold=self.ls_threshold)
-            gene_selected = laplacian_selector.select_features(self.data_array)
-            self.data_array = self.data_array[:, gene_selected]
-            self.names = self.names[gene_selected]
+            laplacian_selector = self._make_selector(
+                LaplacianSelector,
+                threshold=self.ls_threshold,
+                graph=self.laplacian_graph,
+            )
+            with self.profiler.stage("laplacian", lambda: (None, len(kept))):
+                laplacian_selector.score(
+                    self.data_array, None if len(kept) == n_genes else kept
+                )
+            gene_selected = laplacian_selector.select_from_scores(
+                laplacian_selector.scores
+            )
+            kept = self._narrow(
+                kept, gene_selected, "outside the Laplacian score window"
+            )
 
         if self.mad_threshold is not None:
-            mad_selector = MADSelector(threshold=self.mad_threshold)
-            gene_selected = mad_selector.select_features(self.data_array)
-            self.data_array = self.data_array[:, gene_selected]
-            self.names = self.names[gene_selected]
+            mad_selector = self._make_selector(
+                MADSelector, threshold=self.mad_threshold
+            )
+            gene_selected = mad_selector.select_from_scores(
+                statistics["mad"].to_numpy()[kept]
+            )
+            kept = self._narrow(kept, gene_selected, "outside the MAD window")
 
         if self.keep_only_protein_coding:
-            breakpoint()
             # FIXME this should be moved to dataset creation (BRCA specific)
-            gene_selected = self.names["gene_type"] == "protein_coding"
-            logging.info(
-                "removing %i non coding genes from dataset",
-                len(gene_selected) - sum(gene_selected),
-            )
-            self.data_array = self.data_array[:, gene_selected]
-            self.names = self.names[gene_selected]
+            gene_selected = self.names["gene_type"].to_numpy()[kept] == "protein_coding"
+            kept = self._narrow(kept, gene_selected, "non coding")
+
+        if len(kept) < n_genes:
+            with self.profiler.stage("gather", self._data_shape):
+                self._keep_genes(kept)
 
-        logger.debug("number of genes selected : %i", len(self.data_array[0]))
+        if sp.issparse(self.data_array):
+            logging.info("densifying %i selected genes", self.data_array.shape[1])
+            self.data_array = self.data_array.toarray()
+
+        logger.debug("number of genes selected : %i", self.data_array.shape[1])
 
     def _feature_transformation(self) -> None:
-        """Perform feature transformation according to additional_processing_steps"""
+        """Perform feature transformation according to additional_processing_steps
+
+        Sorting, normalization, log(1 + x) and min-max scaling are fused by the
+        transformation engine into a single copy of the matrix, of type `dtype`. The
+        matrix is only transformed in place when the builder owns it, never while it
+        still is the raw matrix of the data interface.
+        """
+        columns = None
+        raw_array = getattr(self.data_interface, "data_array", None)
+        if np.may_share_memory(self.data_array, raw_array):
+            # gathering all columns keeps the raw matrix from being modified
+            columns = np.arange(self.data_array.shape[1])
         if self.sort_symbols:
             logging.info(
                 "sorting based on genomic position chr then transcript start..."
             )
-            self.names = self.names.sort_values(
-                ["genomic_pos.chr", "genomic_pos.start"], ascending=[True, True]
+            columns = (
+                self.names.reset_index(drop=True)
+                .sort_values(["genomic_pos.chr", "genomic_pos.start"])
+                .index.to_numpy()
             )
-            self.data_array = self.data_array[:, self.names.index]
+            self.names = self.names.iloc[columns]
+
+        logging.info(
+            "transforming data (normalization: %s, log1p: %s, min-max: %s) as %s...",
+            self.normalization,
+            self.log1p,
+            self.min_max,
+            np.dtype(self.dtype),
+        )
+        self.transformation_engine = TransformationEngine(
+            normalization=self.normalization,
+            log1p=self.log1p,
+            min_max=self.min_max,
+            dtype=self.dtype,
+        )
+        self.data_array = self.transformation_engine.transform(
+            self.data_array, columns
+        )
 
-        if self.normalization:
-            logging.info("normalizing data...")
-            self.data_array = normalize(self.data_array)
+    def _stage_parameters(self) -> dict[str, dict]:
+        """Parameters each stage result depends on, besides its input."""
+        return {
+            "raw": {},
+            "selection": {
+                "MAD_threshold": self.mad_threshold,
+                "LS_threshold": self.ls_threshold,
+                "expression_threshold": self.expression_threshold,
+                "HVG_threshold": self.hvg_threshold,
+                "laplacian_graph": self.laplacian_graph,
+                "keep_only_protein_coding": self.keep_only_protein_coding,
+            },
+            "transformation": {
+                "sort_symbols": self.sort_symbols,
+                "normalization": self.normalization,
+                "log1p": self.log1p,
+                "min_max": self.min_max,
+                "dtype": str(np.dtype(self.dtype)),
+            },
+        }
 
-        if self.log1p:
-            logging.info("log(1 + x) transformation...")
-            self.data_array = np.log1p(self.data_array)
+    def _stage_state(self) -> dict:
+        """State of the builder stored along with the matrix of a stage."""
+        return {
+            "names": self.names,
+            "meta_data": self.meta_data,
+            "subtypes": self.subtypes,
+            "entry_names": self.entry_names,
+            "transformation_engine": self.transformation_engine,
+        }
+
+    def _load_stage(self, stage: str, key: str) -> bool:
+        """Restore the builder from a cached stage result.
 
-        if self.min_max:
-            logging.info("scaling to [0, 1]...")
-            scaler = MinMaxScaler(feature_range=(0, 1), clip=True)
-            self.data_array = scaler.fit_transform(self.data_array)
+        A result stored without its matrix, as the raw stage is when the interface
+        has a raw matrix cache, takes the matrix from that cache.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage.
+        key : str
+            Cache key of the stage result.
+
+        Returns
+        -------
+        bool
+            Whether the builder was restored.
+        """
+        cached = self.stage_cache.load(stage, key)
+        if cached is None:
+            return False
+        data_array, state = cached
+        if data_array is None:
+            data_array = self.data_interface.cached_raw_matrix()
+            if data_array is None:
+                logging.info("%s stage cache hit without its raw matrix", stage)
+                return False
+        self.data_array = data_array
+        for attribute, value in state.items():
+            setattr(self, attribute, value)
+        return True
+
+    def _run_stages(self) -> None:
+        """Run the building stages, resuming from the deepest cached one.
+
+        Without a stage cache every stage runs. Otherwise the key of each stage
+        chains the key of its input with its own parameters, the raw stage being
+        keyed by the data files and interface settings, and the stages following
+        the deepest cached result run and are cached in turn. The raw stage only
+        stores its state when the interface keeps the matrix in its raw matrix
+        cache.
+        """
+        stages = {
+            "raw": self._build_unprocessed_component,
+            "selection": self._feature_selection,
+            "transformation": self._feature_transformation,
+        }
+        if self.stage_cache is None:
+            for stage, run_stage in stages.items():
+                with self.profiler.stage(stage, self._data_shape):
+                    run_stage()
+            return
+
+        names = list(stages)
+        start = 0
+        with self.profiler.stage("stage_cache", self._data_shape):
+            keys = {}
+            upstream_key = self.data_interface.source_key()
+            for stage, parameters in self._stage_parameters().items():
+                upstream_key = self.stage_cache.key(upstream_key, stage, parameters)
+                keys[stage] = upstream_key
+            for depth in reversed(range(len(names))):
+                if self._load_stage(names[depth], keys[names[depth]]):
+                    start = depth + 1
+                    break
+        for stage in names[start:]:
+            with self.profiler.stage(stage, self._data_shape):
+                stages[stage]()
+                data_array = self.data_array
+                if stage == "raw" and self.data_interface.cache_dir is not None:
+                    # the raw matrix cache already holds the matrix
+                    data_array = None
+                self.stage_cache.save(
+                    stage, keys[stage], data_array, self._stage_state()
+                )
+        logging.info("stage cache statistics: %s", self.stage_cache.stats())
 
     def generate_dataset(
         self,
     ) -> tuple[pd.DataFrame, pd.DataFrame]:
         """Generate dataset, from data loading to feature selection and transformation.
 
+        The selected genes and fitted transformation are kept in
+        `preprocessing_artifact`, to apply to new samples, and the time and memory
+        spent in each stage in `profiler`.
+
         Returns
         -------
         tuple[pd.DataFrame, pd.DataFrame]
             Tuple containing dataset and metadata.
         """
-        self._build_unprocessed_component()
-        self._feature_selection()
-        self._feature_transformation()
+        self._run_stages()
+        for record in self.profiler.records:
+            logging.info(
+                "%s: %.2fs wall, %.2fs CPU, peak RSS %.1f MiB (from %.1f MiB), "
+                "%s -> %s genes",
+                record["stage"],
+                record["wall_seconds"],
+                record["cpu_seconds"],
+                record["peak_rss_bytes"] / 2**20,
+                record["rss_before_bytes"] / 2**20,
+                record["genes_in"],
+                record["genes_out"],
+            )
+        self.preprocessing_artifact = PreprocessingArtifact(
+            self.names["gene_id"].to_numpy(),
+            self.transformation_engine,
+            matrix_fingerprint(self.data_array),
+        )
 
         logging.info("number of seq in the dataset : %i", len(self.data_array))
 
@@ -197,10 +513,7 @@ class DatasetBuilder:
             data=self.data_array, index=self.entry_names, columns=self.names["gene_id"]
         )
 
-        meta_dict = {
-            "meta_data": self.meta_data,
-            "subtypes": self.subtypes or [None] * len(self.meta_data),
-        }
-        meta_df = pd.DataFrame(meta_dict, index=self.entry_names)
+        meta_df = self.meta_data.set_axis(self.entry_names, axis=0)
+        meta_df["subtypes"] = self.subtypes or [None] * len(meta_df)
 
         return df, meta_df
@@ -0,0 +1,104 @@
+"""Binary storage of generated datasets.
+
+A dataset is stored as a raw `.npy` matrix (samples x genes), along with a `.json`
+index of its sample and gene names, so that it loads without parsing, optionally
+memory-mapped, and without loss of precision. CSV remains available as an export.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+INDEX_SUFFIX = ".json"
+
+
+def _index_path(path: Path) -> Path:
+    """Path of the index stored along with a matrix."""
+    return path.with_suffix(INDEX_SUFFIX)
+
+
+def save_dataset(path: Path, df: pd.DataFrame) -> None:
+    """Store a dataset as a `.npy` matrix and a `.json` index.
+
+    Both files are written through temporary files, the index last.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the `.npy` matrix.
+    df : pd.DataFrame
+        Dataset, with samples as index and genes as columns.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(df.to_numpy()))
+    os.replace(tmp_path, path)
+    index = {
+        "samples": [str(sample) for sample in df.index],
+        "genes": [str(gene) for gene in df.columns],
+    }
+    index_path = _index_path(path)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(index), encoding="utf-8")
+    os.replace(tmp_path, index_path)
+    logging.info("saved %i x %i dataset to %s", *df.shape, path)
+
+
+def load_dataset_array(path: Path, mmap_mode: str | None = None) -> np.ndarray:
+    """Read the matrix of a stored dataset.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the `.npy` matrix.
+    mmap_mode : str | None, optional
+        Memory-map mode passed to `np.load`, by default None (read in memory)
+
+    Returns
+    -------
+    np.ndarray
+        Matrix of the dataset (samples x genes).
+    """
+    return np.load(path, mmap_mode=mmap_mode)
+
+
+def load_dataset(path: Path, mmap_mode: str | None = None) -> pd.DataFrame:
+    """Read a stored dataset.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the `.npy` matrix.
+    mmap_mode : str | None, optional
+        Memory-map mode passed to `np.load`, by default None (read in memory)
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataset, with samples as index and genes as columns.
+    """
+    index = json.loads(_index_path(path).read_text(encoding="utf-8"))
+    return pd.DataFrame(
+        load_dataset_array(path, mmap_mode),
+        index=index["samples"],
+        columns=index["genes"],
+        copy=False,
+    )
+
+
+def export_csv(path: Path, csv_path: Path) -> None:
+    """Export a stored dataset as CSV.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the `.npy` matrix.
+    csv_path : Path
+        Destination CSV file.
+    """
+    load_dataset(path, mmap_mode="r").to_csv(csv_path)
@@ -1,11 +1,167 @@
 """Abstract class for feature selection"""
 
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
 import numpy as np
 import matplotlib.pyplot as plt
+import scipy.sparse as sp
 
 from sklearn.preprocessing import StandardScaler
 
+from .score_cache import ScoreCache, matrix_fingerprint
+
+DEFAULT_BLOCK_SIZE = 1024
+
+
+def column_block(
+    data_array: np.ndarray | sp.spmatrix,
+    start: int,
+    stop: int,
+    columns: np.ndarray | None = None,
+) -> np.ndarray:
+    """Read columns [start, stop) as a dense float64 block.
+
+    Parameters
+    ----------
+    data_array : np.ndarray | sp.spmatrix
+        Dense, memory-mapped or CSC matrix.
+    start : int
+        Index of the first column.
+    stop : int
+        Index after the last column.
+    columns : np.ndarray | None, optional
+        Indices of the columns to consider, by default None (all). start and stop
+        then index into columns.
+
+    Returns
+    -------
+    np.ndarray
+        The block, always a new array that callers may modify in place.
+    """
+    if columns is None:
+        block = data_array[:, start:stop]
+    else:
+        block = data_array[:, columns[start:stop]]
+    if sp.issparse(block):
+        return block.toarray().astype(np.float64, copy=False)
+    return np.array(block, dtype=np.float64)
+
+
+def column_blocks(
+    data_array: np.ndarray | sp.spmatrix,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    columns: np.ndarray | None = None,
+) -> Iterator[tuple[int, np.ndarray]]:
+    """Iterate over dense float64 blocks of consecutive columns.
+
+    Works on dense, memory-mapped and sparse matrices alike. Sparse matrices are
+    densified one block at a time.
+
+    Parameters
+    ----------
+    data_array : np.ndarray | sp.spmatrix
+        Matrix to iterate over.
+    block_size : int, optional
+        Number of columns per block, by default DEFAULT_BLOCK_SIZE
+    columns : np.ndarray | None, optional
+        Indices of the columns to iterate over, by default None (all)
+
+    Yields
+    ------
+    tuple[int, np.ndarray]
+        Position of the first column of the block, and the block.
+    """
+    if sp.issparse(data_array):
+        data_array = data_array.tocsc()
+    n_columns = data_array.shape[1] if columns is None else len(columns)
+    for start in range(0, n_columns, block_size):
+        yield start, column_block(data_array, start, start + block_size, columns)
+
+
+def for_each_column_block(
+    data_array: np.ndarray | sp.spmatrix,
+    process: Callable[[int, int, np.ndarray], None],
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    n_jobs: int = 1,
+    columns: np.ndarray | None = None,
+) -> None:
+    """Process blocks of columns in `n_jobs` threads, with bounded memory.
+
+    Blocks are read by the thread processing them, and no more than `n_jobs` are
+    in flight at once.
+
+    Parameters
+    ----------
+    data_array : np.ndarray | sp.spmatrix
+        Dense, memory-mapped or sparse matrix (samples x features).
+    process : Callable[[int, int, np.ndarray], None]
+        Called with the start and stop positions of every block, and the dense
+        float64 block.
+    block_size : int, optional
+        Number of columns per block, by default DEFAULT_BLOCK_SIZE
+    n_jobs : int, optional
+        Number of threads, by default 1
+    columns : np.ndarray | None, optional
+        Indices of the columns to process, by default None (all)
+    """
+    if sp.issparse(data_array):
+        data_array = data_array.tocsc()
+    n_columns = data_array.shape[1] if columns is None else len(columns)
+
+    def run(start: int) -> None:
+        stop = min(start + block_size, n_columns)
+        process(start, stop, column_block(data_array, start, stop, columns))
+
+    starts = range(0, n_columns, block_size)
+    if n_jobs == 1:
+        for start in starts:
+            run(start)
+        return
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        pending: deque = deque()
+        for start in starts:
+            if len(pending) >= n_jobs:
+                pending.popleft().result()
+            pending.append(executor.submit(run, start))
+        for future in pending:
+            future.result()
+
+
+def top_k_mask(
+    scores: np.ndarray, n_features: int, admissible: np.ndarray | None = None
+) -> np.ndarray:
+    """Mask of the highest scores, found with a partial sort in linear time.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        Score of every feature.
+    n_features : int
+        Number of features to select.
+    admissible : np.ndarray | None, optional
+        Boolean mask of the features that may be selected, by default None (all).
+
+    Returns
+    -------
+    np.ndarray
+        Boolean mask of the min(n_features, n_admissible) best admissible features.
+    """
+    candidates = np.arange(len(scores))
+    if admissible is not None:
+        candidates = candidates[admissible]
+    selection = np.zeros(len(scores), dtype=bool)
+    n_selected = min(n_features, len(candidates))
+    if n_selected <= 0:
+        return selection
+    if n_selected < len(candidates):
+        kth = len(candidates) - n_selected
+        candidates = candidates[np.argpartition(scores[candidates], kth)[kth:]]
+    selection[candidates] = True
+    return selection
+
 
 class BaseFeatureSelector(ABC):
     """Base Abstract class for FeatureSelectors
@@ -16,18 +172,39 @@ class BaseFeatureSelector(ABC):
         Selection threshold for given task, by default None
     n_features : int | None, optional
         Number of features to select for given task, by default None
+    block_size : int, optional
+        Number of features scored at once, by default DEFAULT_BLOCK_SIZE
+    n_jobs : int, optional
+        Number of threads scoring blocks, by default 1
+
+    Notes
+    -----
+    Block-wise scoring reads at most `n_jobs` blocks of columns at a time, so that
+    memory-mapped matrices larger than RAM can be scored. Each block is held as
+    float64 along with a few temporaries of its size, which bounds the memory used
+    for scoring to about 3 * 8 * n_samples * block_size * n_jobs bytes (plus
+    O(n_samples^2) for the dense Laplacian graph).
     """
 
-    def __init__(self, threshold: float | None = None, n_features: int | None = None):
+    def __init__(
+        self,
+        threshold: float | None = None,
+        n_features: int | None = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        n_jobs: int = 1,
+    ):
         self.scaler = StandardScaler()
         self.scores: list[float] = []
         self.threshold: float | None = threshold
         self.n_features: int | None = n_features
+        self.block_size = block_size
+        self.n_jobs = n_jobs
+        self.score_cache: ScoreCache | None = None
         self._plot_title: str = ""
         self._plot_x_label: str = "Scores Value"
         self._plot_range_values: list[float] = [0, 0.01]
         assert (
-            self.threshold or self.n_features is not None
+            self.threshold is not None or self.n_features is not None
         ), "Must specify either feature threshold or count"
         assert (
             not (self.threshold is not None and self.n_features is not None)
@@ -59,3 +236,192 @@ class BaseFeatureSelector(ABC):
         plt.legend()
         plt.grid(True)
         plt.show()
+
+
+class ScoreBasedSelector(BaseFeatureSelector):
+    """Base class of the selectors keeping the features whose score passes a
+    threshold, or the `n_features` best scoring ones.
+
+    Subclasses compute the score of every feature in `compute_scores` and define
+    the threshold test in `_threshold_mask`.
+
+    When `score_cache` is set, scores are stored and reused for identical matrices
+    and scoring parameters, and `sweep` derives selections for many thresholds from
+    a single score computation.
+    """
+
+    @abstractmethod
+    def compute_scores(
+        self, data_array: np.ndarray | sp.spmatrix, columns: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Score every feature of the data.
+
+        Parameters
+        ----------
+        data_array : np.ndarray | sp.spmatrix
+            Data to score (samples x features).
+        columns : np.ndarray | None, optional
+            Indices of the features to score, by default None (all). Scores then
+            match `data_array[:, columns]`, without copying it.
+
+        Returns
+        -------
+        np.ndarray
+            Score of every feature.
+        """
+
+    def score_parameters(self) -> dict:
+        """Parameters the scores depend on, part of the score cache key.
+
+        Returns
+        -------
+        dict
+            Parameters by name.
+        """
+        return {}
+
+    def score(
+        self, data_array: np.ndarray | sp.spmatrix, columns: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Score every feature, through the score cache if one is set.
+
+        Parameters
+        ----------
+        data_array : np.ndarray | sp.spmatrix
+            Data to score (samples x features).
+        columns : np.ndarray | None, optional
+            Indices of the features to score, by default None (all)
+
+        Returns
+        -------
+        np.ndarray
+            Score of every feature, also kept in `scores`.
+        """
+        if self.score_cache is None:
+            self.scores = self.compute_scores(data_array, columns)
+            return self.scores
+        key = self.score_cache.key(
+            type(self).__name__,
+            self.score_parameters(),
+            matrix_fingerprint(data_array, columns),
+        )
+        scores = self.score_cache.load(key)
+        if scores is None:
+            scores = self.compute_scores(data_array, columns)
+            self.score_cache.save(key, scores)
+        self.scores = scores
+        return self.scores
+
+    def select_from_scores(self, scores: np.ndarray) -> np.ndarray:
+        """Select features from precomputed scores.
+
+        Parameters
+        ----------
+        scores : np.ndarray
+            Score of every feature, kept in `scores`.
+
+        Returns
+        -------
+        np.ndarray
+            Boolean mask of the selected features.
+        """
+        self.scores = np.asarray(scores)
+        return self._select(self.scores, self.threshold, self.n_features)
+
+    def _select(
+        self, scores: np.ndarray, threshold: float | None, n_features: int | None
+    ) -> np.ndarray:
+        """Selection mask for given scores and threshold or feature count.
+
+        With a feature count, the highest scoring admissible features are kept.
+
+        Parameters
+        ----------
+        scores : np.ndarray
+            Score of every feature.
+        threshold : float | None
+            Selection threshold.
+        n_features : int | None
+            Number of features to select.
+
+        Returns
+        -------
+        np.ndarray
+            Boolean mask of the selected features.
+        """
+        scores = np.asarray(scores)
+        if n_features is not None:
+            return top_k_mask(scores, n_features, self._admissible(scores))
+        return self._threshold_mask(scores, threshold)
+
+    @abstractmethod
+    def _threshold_mask(self, scores: np.ndarray, threshold: float) -> np.ndarray:
+        """Boolean mask of the features passing the threshold."""
+
+    def _admissible(self, scores: np.ndarray) -> np.ndarray:
+        """Boolean mask of the features a top-k selection may keep."""
+        return np.isfinite(scores)
+
+    def sweep(
+        self,
+        data_array: np.ndarray | sp.spmatrix,
+        thresholds: list[float] | None = None,
+        n_features: list[int] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Select features for many thresholds or feature counts from one scoring.
+
+        Parameters
+        ----------
+        data_array : np.ndarray | sp.spmatrix
+            Data to select features from.
+        thresholds : list[float] | None, optional
+            Thresholds to try, by default None
+        n_features : list[int] | None, optional
+            Feature counts to try, by default None
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            Selection masks (one row per value) and number of selected features for
+            every value.
+        """
+        assert (thresholds is None) != (
+            n_features is None
+        ), "Must specify either thresholds or feature counts"
+        scores = self.score(data_array)
+        if thresholds is not None:
+            masks = [self._select(scores, threshold, None) for threshold in thresholds]
+        else:
+            masks = [self._select(scores, None, count) for count in n_features]
+        masks = np.array(masks, dtype=bool).reshape(-1, len(scores))
+        return masks, masks.sum(axis=1)
+
+    def blockwise_scores(
+        self,
+        data_array: np.ndarray | sp.spmatrix,
+        score_block: Callable[[np.ndarray], np.ndarray],
+        columns: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Score features a block of columns at a time, in `n_jobs` threads.
+
+        Parameters
+        ----------
+        data_array : np.ndarray | sp.spmatrix
+            Dense, memory-mapped or sparse matrix (samples x features).
+        score_block : Callable[[np.ndarray], np.ndarray]
+            Scores of the columns of a dense float64 block.
+        columns : np.ndarray | None, optional
+            Indices of the features to score, by default None (all)
+
+        Returns
+        -------
+        np.ndarray
+            Score of every feature.
+        """
+        scores = np.empty(data_array.shape[1] if columns is None else len(columns))
+
+        def fill(start: int, stop: int, block: np.ndarray) -> None:
+            scores[start:stop] = score_block(block)
+
+        for_each_column_block(data_array, fill, self.block_size, self.n_jobs, columns)
+        return scores
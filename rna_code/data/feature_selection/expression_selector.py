@@ -3,11 +3,12 @@
 import logging
 
 import numpy as np
+import scipy.sparse as sp
 
-from .base_feature_selector import BaseFeatureSelector
+from .base_feature_selector import DEFAULT_BLOCK_SIZE, ScoreBasedSelector
 
 
-class ExpressionSelector(BaseFeatureSelector):
+class ExpressionSelector(ScoreBasedSelector):
     """Feature selection based on expression threshold
 
     Parameters
@@ -16,27 +17,64 @@ class ExpressionSelector(BaseFeatureSelector):
         Expression threshold, by default None
     n_features : int | None, optional
         Number of features to select for given task, by default None
+    block_size : int, optional
+        Number of features scored at once, by default DEFAULT_BLOCK_SIZE
+    n_jobs : int, optional
+        Number of threads scoring blocks, by default 1
     """
-    def __init__(self, threshold: float | None = None, n_features : int | None = None):
-        super().__init__(threshold, n_features)
+    def __init__(
+        self,
+        threshold: float | None = None,
+        n_features: int | None = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        n_jobs: int = 1,
+    ):
+        super().__init__(threshold, n_features, block_size, n_jobs)
         self._plot_title = "Distribution of Non Zero values per genes"
         self._plot_range_values: list[float] = [0, 1]
 
-    def select_features(self, data_array)  -> np.ndarray:
+    def compute_scores(self, data_array, columns=None) -> np.ndarray:
         """
-        Selects features based on gene expression levels.
+        Fraction of samples expressing each gene.
+
+        Dense input is scored block-wise, sparse input from its non-zero pattern.
+
+        Parameters:
+            data_array (numpy.ndarray | scipy.sparse.spmatrix): The dataset to process.
+            columns (numpy.ndarray, optional): Indices of the genes to score.
+
+        Returns:
+            numpy.ndarray: Fraction of non-zero values of every gene.
+        """
+        if sp.issparse(data_array):
+            non_zero = np.asarray((data_array != 0).sum(axis=0)).ravel()
+            if columns is not None:
+                non_zero = non_zero[columns]
+        else:
+            non_zero = self.blockwise_scores(
+                data_array, lambda block: np.count_nonzero(block, axis=0), columns
+            )
+        return non_zero / data_array.shape[0]
+
+    def _threshold_mask(self, scores, threshold) -> np.ndarray:
+        """Keep genes expressed in more than a (1 - threshold) fraction of samples."""
+        return scores > (1 - threshold)
+
+    def select_features(self, data_array) -> np.ndarray:
+        """
+        Selects features based on gene expression levels, the most expressed ones
+        when n_features is set.
 
         Parameters:
-            data_array (numpy.ndarray): The dataset to process.
-            threshold (float): The threshold for feature selection.
+            data_array (numpy.ndarray | scipy.sparse.spmatrix): The dataset to process.
 
         Returns:
-            list: A list of boolean values indicating selected features.
+            numpy.ndarray: A boolean mask indicating selected features.
         """
-        self.scores = np.count_nonzero(data_array, axis=0) / data_array.shape[0]
-        selection = [val > (1 - self.threshold) for val in self.scores]
+        self.score(data_array)
+        selection = self._select(self.scores, self.threshold, self.n_features)
         logging.info(
-            "removing %i genes under the expression threshold from the dataset",
-            len(selection) - sum(selection),
+            "removing %i genes under the expression selection from the dataset",
+            len(selection) - selection.sum(),
         )
         return selection
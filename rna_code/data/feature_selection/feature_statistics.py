@@ -0,0 +1,70 @@
+"""Per-feature statistics computed in a single pass over the data."""
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .base_feature_selector import DEFAULT_BLOCK_SIZE, for_each_column_block
+from .score_cache import ScoreCache, matrix_fingerprint
+
+FEATURE_STATISTICS = ["nonzero_fraction", "median", "mad", "mean", "variance"]
+
+
+def feature_statistics(
+    data_array: np.ndarray | sp.spmatrix,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    n_jobs: int = 1,
+    score_cache: ScoreCache | None = None,
+) -> pd.DataFrame:
+    """Fraction of non-zero values, median, median absolute deviation, mean and
+    unbiased variance of every column, from one read of each block of columns.
+
+    The non-zero fraction and MAD are the `ExpressionSelector` and `MADSelector`
+    scores, the mean and variance give the `HVGSelector` ones. With a score cache,
+    the statistics are stored and reused for identical matrices, so that builds
+    differing only by their thresholds compute them once.
+
+    Parameters
+    ----------
+    data_array : np.ndarray | sp.spmatrix
+        Dense, memory-mapped or sparse matrix (samples x features).
+    block_size : int, optional
+        Number of columns read at once, by default DEFAULT_BLOCK_SIZE
+    n_jobs : int, optional
+        Number of threads processing blocks, by default 1
+    score_cache : ScoreCache | None, optional
+        Cache of the statistics, by default None
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per column, with FEATURE_STATISTICS.
+    """
+    key = None
+    if score_cache is not None:
+        key = score_cache.key(
+            "feature_statistics",
+            {"statistics": FEATURE_STATISTICS},
+            matrix_fingerprint(data_array),
+        )
+        statistics = score_cache.load(key)
+        if statistics is not None:
+            return pd.DataFrame(statistics, columns=FEATURE_STATISTICS)
+
+    n_samples, n_features = data_array.shape
+    statistics = np.empty((len(FEATURE_STATISTICS), n_features))
+
+    def process(start: int, stop: int, block: np.ndarray) -> None:
+        statistics[0, start:stop] = np.count_nonzero(block, axis=0) / n_samples
+        statistics[3, start:stop] = block.mean(axis=0)
+        statistics[4, start:stop] = block.var(axis=0, ddof=1)
+        median = np.median(block, axis=0)
+        statistics[1, start:stop] = median
+        block -= median
+        np.abs(block, out=block)
+        statistics[2, start:stop] = np.median(block, axis=0, overwrite_input=True)
+
+    for_each_column_block(data_array, process, block_size, n_jobs)
+    if score_cache is not None:
+        score_cache.save(key, statistics.T)
+    return pd.DataFrame(statistics.T, columns=FEATURE_STATISTICS)
@@ -0,0 +1,166 @@
+"""Module for highly variable gene (dispersion based) feature selection"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .base_feature_selector import (
+    DEFAULT_BLOCK_SIZE,
+    ScoreBasedSelector,
+    for_each_column_block,
+)
+
+DEFAULT_N_BINS = 20
+
+
+def mean_and_variance(
+    data_array: np.ndarray | sp.spmatrix,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    n_jobs: int = 1,
+    columns: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Mean and unbiased variance of every column, read one block at a time.
+
+    Parameters
+    ----------
+    data_array : np.ndarray | sp.spmatrix
+        Dense, memory-mapped or sparse matrix (samples x features).
+    block_size : int, optional
+        Number of columns read at once, by default DEFAULT_BLOCK_SIZE
+    n_jobs : int, optional
+        Number of threads processing blocks, by default 1
+    columns : np.ndarray | None, optional
+        Indices of the columns to consider, by default None (all)
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Mean and variance of every column.
+    """
+    n_columns = data_array.shape[1] if columns is None else len(columns)
+    mean, variance = np.empty(n_columns), np.empty(n_columns)
+
+    def process(start: int, stop: int, block: np.ndarray) -> None:
+        mean[start:stop] = block.mean(axis=0)
+        variance[start:stop] = block.var(axis=0, ddof=1)
+
+    for_each_column_block(data_array, process, block_size, n_jobs, columns)
+    return mean, variance
+
+
+def normalized_dispersion(
+    mean: np.ndarray, variance: np.ndarray, n_bins: int = DEFAULT_N_BINS
+) -> np.ndarray:
+    """Dispersion of every gene, standardized among genes of similar mean.
+
+    Genes are binned on log(1 + mean) into `n_bins` equal-width bins, and the log
+    dispersion log(variance / mean) of each gene is z-scored within its bin.
+
+    Parameters
+    ----------
+    mean : np.ndarray
+        Mean of every gene.
+    variance : np.ndarray
+        Variance of every gene.
+    n_bins : int, optional
+        Number of mean bins, by default DEFAULT_N_BINS
+
+    Returns
+    -------
+    np.ndarray
+        Normalized dispersion, NaN for genes that are never expressed. Genes alone
+        in their bin get 0.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dispersion = np.log(variance / mean)
+    dispersion[~np.isfinite(dispersion)] = np.nan
+    log_mean = np.log1p(mean)
+    edges = np.linspace(np.nanmin(log_mean), np.nanmax(log_mean), n_bins + 1)
+    bins = np.clip(np.searchsorted(edges, log_mean, side="right") - 1, 0, n_bins - 1)
+    grouped = pd.Series(dispersion).groupby(bins)
+    bin_mean = grouped.transform("mean").to_numpy()
+    bin_std = grouped.transform("std").to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = (dispersion - bin_mean) / bin_std
+    normalized[np.isfinite(dispersion) & ~np.isfinite(bin_std)] = 0
+    return normalized
+
+
+class HVGSelector(ScoreBasedSelector):
+    """Feature selection of highly variable genes, based on the normalized
+    dispersion within bins of similar mean expression.
+
+    Unlike the Laplacian score, it only needs the mean and variance of each gene,
+    which are computed in linear time in the number of samples.
+
+    Parameters
+    ----------
+    threshold : float | None, optional
+        Minimum normalized dispersion, by default None
+    n_features : int | None, optional
+        Number of features to select for given task, by default None
+    n_bins : int, optional
+        Number of mean expression bins, by default DEFAULT_N_BINS
+    block_size : int, optional
+        Number of features scored at once, by default DEFAULT_BLOCK_SIZE
+    n_jobs : int, optional
+        Number of threads scoring blocks, by default 1
+    """
+
+    def __init__(
+        self,
+        threshold: float | None = None,
+        n_features: int | None = None,
+        n_bins: int = DEFAULT_N_BINS,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        n_jobs: int = 1,
+    ):
+        super().__init__(threshold, n_features, block_size, n_jobs)
+        self.n_bins = n_bins
+        self._plot_title = "Distribution of normalized dispersion"
+        self._plot_range_values: list[float] = [-3, 10]
+
+    def compute_scores(self, data_array, columns=None) -> np.ndarray:
+        """
+        Normalized dispersion of each gene.
+
+        Parameters:
+            data_array (numpy.ndarray | scipy.sparse.spmatrix): The dataset to process.
+            columns (numpy.ndarray, optional): Indices of the genes to score.
+
+        Returns:
+            numpy.ndarray: Normalized dispersion of every gene.
+        """
+        mean, variance = mean_and_variance(
+            data_array, self.block_size, self.n_jobs, columns
+        )
+        return normalized_dispersion(mean, variance, self.n_bins)
+
+    def score_parameters(self) -> dict:
+        """Number of mean bins."""
+        return {"n_bins": self.n_bins}
+
+    def _threshold_mask(self, scores, threshold) -> np.ndarray:
+        """Keep genes whose normalized dispersion exceeds the threshold."""
+        return scores > threshold
+
+    def select_features(self, data_array) -> np.ndarray:
+        """
+        Selects highly variable genes, the most dispersed ones when n_features is
+        set.
+
+        Parameters:
+            data_array (numpy.ndarray | scipy.sparse.spmatrix): The dataset to process.
+
+        Returns:
+            numpy.ndarray: A boolean mask indicating selected features.
+        """
+        self.score(data_array)
+        selection = self._select(self.scores, self.threshold, self.n_features)
+        logging.info(
+            "removing %i genes under the dispersion threshold from the dataset",
+            len(selection) - selection.sum(),
+        )
+        return selection
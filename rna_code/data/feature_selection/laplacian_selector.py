@@ -1,16 +1,29 @@
 """Module for Laplacian Score based feature selection"""
 
 import logging
+from typing import Literal
 
 import numpy as np
+import scipy.sparse as sp
 from scipy.spatial.distance import pdist, squareform
+from sklearn.metrics.pairwise import euclidean_distances
+from sklearn.neighbors import NearestNeighbors
 
-from .base_feature_selector import BaseFeatureSelector
+from .base_feature_selector import (
+    DEFAULT_BLOCK_SIZE,
+    ScoreBasedSelector,
+    column_blocks,
+)
 
 
-class LaplacianSelector(BaseFeatureSelector):
+class LaplacianSelector(ScoreBasedSelector):
     """Feature selection based on Laplacian score.
 
+    With the dense graph, every pair of samples is connected and the n x n distance
+    and affinity matrices are materialized. With the kNN graph, samples are only
+    connected to their k nearest neighbors (and themselves), so that memory stays
+    linear in the number of samples; scores then approximate the dense ones.
+
     Parameters
     ----------
     threshold : float | None, optional
@@ -19,59 +32,166 @@ class LaplacianSelector(BaseFeatureSelector):
         Number of features to select for given task, by default None
     k : int, optional
         Number of neighbors for the kNN algorithm, by default 5
+    graph : Literal["dense", "knn"], optional
+        Affinity graph between samples, by default "dense"
+    sigma_samples : int | None, optional
+        Number of samples the kernel bandwidth is estimated on, by default None (all)
+    random_state : int, optional
+        Seed of the sample subset used to estimate the bandwidth, by default 0
+    block_size : int, optional
+        Number of features scored at once, by default DEFAULT_BLOCK_SIZE
+    n_jobs : int, optional
+        Number of threads scoring blocks, by default 1
     """
 
     def __init__(
-        self, threshold: float | None = None, n_features: int | None = None, k: int = 5
+        self,
+        threshold: float | None = None,
+        n_features: int | None = None,
+        k: int = 5,
+        graph: Literal["dense", "knn"] = "dense",
+        sigma_samples: int | None = None,
+        random_state: int = 0,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        n_jobs: int = 1,
     ):
-        super().__init__(threshold, n_features)
+        super().__init__(threshold, n_features, block_size, n_jobs)
+        if graph not in ("dense", "knn"):
+            raise ValueError(f"Unknown graph {graph}, expected 'dense' or 'knn'")
         self.k = k
+        self.graph = graph
+        self.sigma_samples = sigma_samples
+        self.random_state = random_state
         self._plot_title = "Distribution of Laplacian Score (LS)"
 
-    def laplacian_score(self, X):
+    def _sigma_rows(self, n_samples: int) -> np.ndarray | slice:
+        """Rows the kernel bandwidth is estimated on."""
+        if self.sigma_samples is None or self.sigma_samples >= n_samples:
+            return slice(None)
+        rng = np.random.default_rng(self.random_state)
+        return rng.choice(n_samples, self.sigma_samples, replace=False)
+
+    def affinity(self, X, columns=None) -> np.ndarray | sp.csr_matrix:
+        """Heat kernel affinity between samples, with a bandwidth set to the mean
+        distance to the k nearest neighbors.
+
+        Parameters
+        ----------
+        X : np.ndarray | sp.spmatrix
+            The dataset (samples x features).
+        columns : np.ndarray | None, optional
+            Indices of the features distances are computed on, by default None (all)
+
+        Returns
+        -------
+        np.ndarray | sp.csr_matrix
+            Affinity matrix W (samples x samples), sparse with the kNN graph.
+        """
+        if self.graph == "knn":
+            return self._knn_affinity(X if columns is None else X[:, columns])
+        if sp.issparse(X):
+            dists = euclidean_distances(X if columns is None else X[:, columns])
+        else:
+            # accumulate squared distances over feature blocks to bound memory
+            squared = np.zeros(X.shape[0] * (X.shape[0] - 1) // 2)
+            for _, block in column_blocks(X, self.block_size, columns):
+                squared += pdist(block, metric="sqeuclidean")
+            dists = squareform(np.sqrt(squared))
+        # the k + 1 smallest distances of a row are its own (0) and its k neighbors'
+        dists_knn = np.partition(dists[self._sigma_rows(len(dists))], self.k, axis=1)
+        sigma = np.sum(dists_knn[:, : self.k + 1]) / (len(dists_knn) * self.k)
+        return np.exp(-(dists**2) / (2 * sigma**2))
+
+    def _knn_affinity(self, X) -> sp.csr_matrix:
+        """Symmetric heat kernel affinity over the kNN graph, with self loops."""
+        n_samples = X.shape[0]
+        distances, neighbors = (
+            NearestNeighbors(n_neighbors=self.k + 1).fit(X).kneighbors(X)
+        )
+        sigma = np.mean(distances[self._sigma_rows(n_samples), 1:])
+        rows = np.repeat(np.arange(n_samples), self.k + 1)
+        not_self = rows != neighbors.ravel()
+        W = sp.csr_matrix(
+            (
+                np.exp(-(distances.ravel()[not_self] ** 2) / (2 * sigma**2)),
+                (rows[not_self], neighbors.ravel()[not_self]),
+            ),
+            shape=(n_samples, n_samples),
+        )
+        return (W.maximum(W.T) + sp.identity(n_samples, format="csr")).tocsr()
+
+    def laplacian_score(self, X, columns=None):
         """
         Computes the Laplacian Score for each feature of the dataset.
 
+        Features are centered and scored a block at a time: with the degree vector
+        d and S = D^-1/2 L D^-1/2, the numerators f.T @ S @ f of a block are the
+        column sums of F * (S @ F) and the denominators f.T @ D @ f are d @ F**2.
+
         Parameters:
-            X (numpy.ndarray): The dataset (samples x features).
-            k (int): Number of neighbors for the KNN graph.
+            X (numpy.ndarray | scipy.sparse.spmatrix): The dataset (samples x features).
+            columns (numpy.ndarray, optional): Indices of the features to consider,
+                as if scoring X[:, columns]. Defaults to all.
 
         Returns:
             numpy.ndarray: Array of Laplacian scores for each feature.
         """
-        dists = squareform(pdist(X, metric="euclidean"))
-        dists_knn = np.sort(dists)[:, 1 : self.k + 1]
-        sigma = np.mean(dists_knn)
-        W = np.exp(-(dists**2) / (2 * sigma**2))
-        D = np.diag(np.sum(W, axis=1))
-        L = D - W
-        D_inverse_sqrt = np.diag(1 / np.sqrt(np.diag(D)))
-        S = D_inverse_sqrt @ L @ D_inverse_sqrt
-
-        fraternities = np.zeros(X.shape[1])
-        for i in range(X.shape[1]):
-            f = X[:, i] - np.mean(X[:, i])
-            fraternities[i] = f.T @ S @ f / (f.T @ D @ f)
-
-        return fraternities
+        W = self.affinity(X, columns)
+        d = np.asarray(W.sum(axis=1)).ravel()
+        d_inverse_sqrt = 1 / np.sqrt(d)
+        if sp.issparse(W):
+            D_inverse_sqrt = sp.diags(d_inverse_sqrt)
+            S = (D_inverse_sqrt @ (sp.diags(d) - W) @ D_inverse_sqrt).tocsr()
+        else:
+            L = -W
+            L[np.diag_indices_from(L)] += d
+            S = d_inverse_sqrt[:, None] * L * d_inverse_sqrt[None, :]
+
+        def score_block(block: np.ndarray) -> np.ndarray:
+            block -= block.mean(axis=0)
+            numerators = np.einsum("ij,ij->j", block, S @ block)
+            denominators = d @ np.square(block)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return numerators / denominators
+
+        return self.blockwise_scores(X, score_block, columns)
+
+    def compute_scores(self, data_array, columns=None) -> np.ndarray:
+        """Laplacian score of every feature, see `laplacian_score`."""
+        return self.laplacian_score(data_array, columns)
+
+    def score_parameters(self) -> dict:
+        """Parameters of the affinity graph."""
+        return {
+            "k": self.k,
+            "graph": self.graph,
+            "sigma_samples": self.sigma_samples,
+            "random_state": self.random_state,
+        }
+
+    def _threshold_mask(self, scores, threshold) -> np.ndarray:
+        """Keep features whose score lies between the threshold and 100."""
+        return (threshold < scores) & (scores < 100)
+
+    def _admissible(self, scores) -> np.ndarray:
+        """Features with a finite score under 100."""
+        return np.isfinite(scores) & (scores < 100)
 
     def select_features(self, data_array):
         """
-        Selects features based on Laplacian Score.
+        Selects features based on Laplacian Score, the highest scoring ones when
+        n_features is set.
 
         Parameters:
             data_array (numpy.ndarray): The dataset to process.
-            threshold (float): The threshold for feature selection.
-            k (int): Number of neighbors for the KNN graph.
-            verbose (int): Controls the verbosity of the function.
 
         Returns:
-            list: A list of boolean values indicating selected features.
+            numpy.ndarray: A boolean mask indicating selected features.
         """
-        self.scores = self.laplacian_score(data_array)
-        selection = [self.threshold < val < 100 for val in self.scores]
+        self.score(data_array)
+        selection = self._select(self.scores, self.threshold, self.n_features)
         logging.info(
             "removing %i genes outside the Laplacian score window from the dataset",
-            len(selection) - sum(selection),
+            len(selection) - selection.sum(),
         )
         return selection
@@ -1,22 +1,102 @@
 """Module for Lasso Regression based feature selection"""
 
 import logging
-from collections import Counter
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+from pathlib import Path
 from typing import Literal
 
 import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.linear_model import SGDClassifier
 from sklearn.metrics import confusion_matrix
-from sklearn.model_selection import GridSearchCV
-from sklearn.utils.random import sample_without_replacement
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+from rna_code.utils.resources import process_pool_context
 
 from .base_feature_selector import BaseFeatureSelector
 
+DEFAULT_PATH_PATIENCE = 3
+DEFAULT_STABILITY_THRESHOLD = 0.6
+
+
+def balanced_indices(
+    labels: np.ndarray, n_per_class: int | None = None, rng: np.random.Generator = None
+) -> np.ndarray:
+    """Draw the same number of samples from every class, without replacement.
+
+    Parameters
+    ----------
+    labels : np.ndarray
+        Label of every sample.
+    n_per_class : int | None, optional
+        Samples drawn per class, by default None (size of the smallest class).
+    rng : np.random.Generator, optional
+        Random generator, by default None (fresh entropy).
+
+    Returns
+    -------
+    np.ndarray
+        Indices of the drawn samples, grouped by class.
+
+    Raises
+    ------
+    ValueError
+        If `n_per_class` is not between 1 and the size of the smallest class.
+    """
+    rng = np.random.default_rng(rng)
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    if n_per_class is None:
+        n_per_class = counts.min()
+    if not 1 <= n_per_class <= counts.min():
+        raise ValueError(
+            f"cannot draw {n_per_class} samples per class, the smallest class has "
+            f"{counts.min()}"
+        )
+    # shuffle samples within their class, then take the head of every class
+    order = np.lexsort((rng.random(len(inverse)), inverse))
+    class_starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return order[(class_starts[:, None] + np.arange(n_per_class)).ravel()]
+
+
+def _fit_resample(
+    data_path: Path, labels: np.ndarray, rows: np.ndarray, estimator: SGDClassifier
+) -> np.ndarray:
+    """Fit an estimator on some rows of a shared `.npy` matrix.
+
+    Parameters
+    ----------
+    data_path : Path
+        Scaled data, opened memory-mapped.
+    labels : np.ndarray
+        Label of every row.
+    rows : np.ndarray
+        Rows to fit on.
+    estimator : SGDClassifier
+        Unfitted estimator.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean mask of the features with a non-zero coefficient.
+    """
+    data_array = np.load(data_path, mmap_mode="r")
+    estimator = clone(estimator).fit(data_array[rows], labels[rows])
+    return estimator.coef_[0] != 0
+
 
 class LassoSelector(BaseFeatureSelector):
     """Feature selection based on Lasso Regression Coefficient.
 
+    Regularization is tuned either by a cross-validated grid search over every
+    (l1_ratio, alpha) pair, or along a regularization path: for each l1_ratio,
+    alphas are visited from the strongest to the weakest regularization with
+    warm-started fits, and the path stops once the cross-validated score has not
+    improved for `patience` points.
+
     Parameters
     ----------
     labels : list
@@ -29,6 +109,26 @@ class LassoSelector(BaseFeatureSelector):
         Parameters for stochastic gradient descent, by default None
     class_balancing : Literal["match_smaller_sample", "balanced", None], optional
         How to solve class imbalance, by default None
+    search : Literal["grid", "path"], optional
+        How to tune regularization, by default "grid"
+    cv : int, optional
+        Number of cross-validation folds, by default 5
+    n_jobs : int, optional
+        Number of parallel fits, by default 4
+    patience : int, optional
+        Number of path points without improvement before stopping a path, by
+        default DEFAULT_PATH_PATIENCE
+    n_resamples : int | None, optional
+        Number of subsampled fits of stability selection, by default None (a single
+        fit on all the data)
+    sample_fraction : float, optional
+        Fraction of the samples (of every class when balancing) drawn for each
+        stability selection fit, at least one, by default 0.5
+    stability_threshold : float, optional
+        Minimum selection frequency in stability selection, by default
+        DEFAULT_STABILITY_THRESHOLD
+    random_state : int | None, optional
+        Seed of the fits and of the stability selection subsamples, by default None
     """
 
     def __init__(
@@ -37,10 +137,26 @@ class LassoSelector(BaseFeatureSelector):
         threshold: float = 0,
         sgdc_params: dict | None = None,
         class_balancing: Literal["match_smaller_sample", "balanced", None] = None,
+        search: Literal["grid", "path"] = "grid",
+        cv: int = 5,
+        n_jobs: int = 4,
+        patience: int = DEFAULT_PATH_PATIENCE,
+        n_resamples: int | None = None,
+        sample_fraction: float = 0.5,
+        stability_threshold: float = DEFAULT_STABILITY_THRESHOLD,
+        random_state: int | None = None,
     ):
-        super().__init__(threshold)
+        super().__init__(threshold, n_jobs=n_jobs)
         self.class_balancing = class_balancing
         self.labels = labels
+        self.search = search
+        self.cv = cv
+        self.patience = patience
+        self.n_resamples = n_resamples
+        self.sample_fraction = sample_fraction
+        self.stability_threshold = stability_threshold
+        self.random_state = random_state
+        self.path_results = pd.DataFrame()
         if sgdc_params is None:
             self.sgdc_params = {
                 "l1_ratio": np.linspace(0.1, 1, 10),
@@ -53,31 +169,99 @@ class LassoSelector(BaseFeatureSelector):
         """
         Selects features using LASSO regression.
 
+        Regularization is tuned on the (balanced) data. With `n_resamples`, the
+        tuned model is then refitted on subsamples and features selected in at
+        least `stability_threshold` of the fits are kept; the selection frequencies
+        are the scores.
+
         Parameters:
             data_array (numpy.ndarray): The dataset to process.
-            labels (numpy.ndarray): The labels associated with the data.
-            sgdc_params (dict, optional): Parameters for the SGDClassifier.
-            class_balancing (str, optional): Method for class balancing.
 
         Returns:
-            list: A list of boolean values indicating selected features.
+            numpy.ndarray: A boolean mask indicating selected features.
         """
         scaled_data = self.scaler.fit_transform(data_array)
         if self.class_balancing == "match_smaller_sample":
             balanced_data, balanced_labels = self._balance_classes(scaled_data)
         else:
             balanced_data, balanced_labels = scaled_data, self.labels
-        sgdc_gs = self._perform_grid_search(balanced_data, balanced_labels)
-        predictions = sgdc_gs.predict(scaled_data)
-        self._print_results(self.labels, predictions, sgdc_gs)
-        self.scores = sgdc_gs.best_estimator_.coef_[0]
-        selection = [abs(coef) > 0 for coef in self.scores]
+        if self.search == "path":
+            best_score, best_estimator = self._follow_regularization_paths(
+                balanced_data, balanced_labels
+            )
+        else:
+            sgdc_gs = self._perform_grid_search(balanced_data, balanced_labels)
+            best_score, best_estimator = sgdc_gs.best_score_, sgdc_gs.best_estimator_
+        predictions = best_estimator.predict(scaled_data)
+        self._print_results(self.labels, predictions, best_score, best_estimator)
+        if self.n_resamples is None:
+            self.scores = best_estimator.coef_[0]
+            selection = np.abs(self.scores) > 0
+        else:
+            self.scores = self.stability_selection(scaled_data, best_estimator)
+            selection = self.scores >= self.stability_threshold
         logging.info(
             "removing %i genes under the LASSO threshold from the dataset",
-            len(selection) - sum(selection),
+            len(selection) - selection.sum(),
         )
         return selection
 
+    def stability_selection(
+        self, scaled_data: np.ndarray, estimator: SGDClassifier
+    ) -> np.ndarray:
+        """Selection frequency of every feature over `n_resamples` subsampled fits.
+
+        Fits run in a pool of `n_jobs` processes. The data is written once to a
+        temporary `.npy` file that every worker opens memory-mapped, so that only
+        row indices are sent to the workers.
+
+        Parameters
+        ----------
+        scaled_data : np.ndarray
+            Scaled data (samples x features).
+        estimator : SGDClassifier
+            Estimator with the tuned regularization.
+
+        Returns
+        -------
+        np.ndarray
+            Fraction of the fits in which every feature has a non-zero coefficient.
+        """
+        labels = np.asarray(self.labels)
+        rng = np.random.default_rng(self.random_state)
+        smallest_class = np.unique(labels, return_counts=True)[1].min()
+        subsamples = []
+        for seed in rng.integers(2**31, size=self.n_resamples):
+            if self.class_balancing == "match_smaller_sample":
+                n_per_class = max(1, int(self.sample_fraction * smallest_class))
+                rows = balanced_indices(labels, n_per_class, rng)
+            else:
+                n_rows = max(1, int(self.sample_fraction * len(labels)))
+                rows = rng.choice(len(labels), n_rows, replace=False)
+            subsamples.append((rows, clone(estimator).set_params(random_state=seed)))
+
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = Path(tmp_dir) / "scaled_data.npy"
+            np.save(data_path, scaled_data)
+            with ProcessPoolExecutor(
+                max_workers=self.n_jobs, mp_context=process_pool_context()
+            ) as executor:
+                selections = list(
+                    executor.map(
+                        _fit_resample,
+                        [data_path] * len(subsamples),
+                        [labels] * len(subsamples),
+                        *zip(*subsamples),
+                    )
+                )
+        logging.info(
+            "stability selection: %i fits in %.2fs",
+            len(selections),
+            time.perf_counter() - start,
+        )
+        return np.mean(selections, axis=0)
+
     def _balance_classes(self, data_array: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """Balance data based on sub-sampling dominant classes
 
@@ -91,18 +275,30 @@ class LassoSelector(BaseFeatureSelector):
         tuple[np.ndarray, np.ndarray]
             Balanced data with corresponding labels
         """
-        cts = Counter(self.labels)
-        minimum = min(cts.values())
-        balanced_data = np.empty((0, data_array.shape[1]), float)
-        balanced_labels = np.array([])
-        for key in cts:
-            sample = sample_without_replacement(cts[key], minimum)
-            patient_in_class = [label == key for label in self.labels]
-            balanced_data = np.append(
-                balanced_data, data_array[patient_in_class, :][sample, :], axis=0
-            )
-            balanced_labels = np.append(balanced_labels, np.repeat(key, minimum))
-        return balanced_data, balanced_labels
+        labels = np.asarray(self.labels)
+        rows = balanced_indices(labels, rng=self.random_state)
+        return data_array[rows], labels[rows]
+
+    def _make_sgdc(self, **params) -> SGDClassifier:
+        """Elastic-net classifier used for selection.
+
+        Parameters
+        ----------
+        **params
+            Parameters overriding the defaults, e.g. alpha or l1_ratio.
+
+        Returns
+        -------
+        SGDClassifier
+            Unfitted classifier.
+        """
+        return SGDClassifier(
+            loss="modified_huber",
+            penalty="elasticnet",
+            max_iter=20000,
+            class_weight="balanced" if self.class_balancing == "balanced" else None,
+            **{"random_state": self.random_state, **params},
+        )
 
     def _perform_grid_search(
         self, data_array: np.ndarray, labels: list | pd.Series
@@ -121,20 +317,127 @@ class LassoSelector(BaseFeatureSelector):
         GridSearchCV
             Grid search estimator containing information relative to best params.
         """
-        sgdc = SGDClassifier(
-            loss="modified_huber",
-            penalty="elasticnet",
-            max_iter=20000,
-            class_weight="balanced" if self.class_balancing == "balanced" else None,
+        sgdc_gs = GridSearchCV(
+            self._make_sgdc(),
+            self.sgdc_params,
+            cv=self.cv,
+            verbose=3,
+            n_jobs=self.n_jobs,
         )
-        sgdc_gs = GridSearchCV(sgdc, self.sgdc_params, cv=5, verbose=3, n_jobs=4)
         sgdc_gs.fit(data_array, labels)
         return sgdc_gs
 
+    def _follow_regularization_paths(
+        self, data_array: np.ndarray, labels: list | pd.Series
+    ) -> tuple[float, SGDClassifier]:
+        """Parameter search along one regularization path per l1_ratio.
+
+        Paths are followed in parallel. Every path point is recorded in
+        `path_results` with its cross-validated score, mean number of non-zero
+        coefficients and wall time.
+
+        Parameters
+        ----------
+        data_array : np.ndarray
+            Data array to find parameters for
+        labels : list | pd.Series
+            labels for classification of said data
+
+        Returns
+        -------
+        tuple[float, SGDClassifier]
+            Best cross-validated score and estimator refitted on all the data.
+        """
+        labels = np.asarray(labels)
+        alphas = np.sort(np.asarray(self.sgdc_params["alpha"], dtype=float))[::-1]
+        folds = list(StratifiedKFold(n_splits=self.cv).split(data_array, labels))
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            paths = executor.map(
+                lambda l1_ratio: self._follow_path(
+                    data_array, labels, l1_ratio, alphas, folds
+                ),
+                self.sgdc_params["l1_ratio"],
+            )
+            self.path_results = pd.DataFrame(list(chain.from_iterable(paths)))
+        best = self.path_results.loc[self.path_results["score"].idxmax()]
+        logging.info(
+            "regularization paths: %i points in %.2fs, best l1_ratio=%.2f alpha=%.3g",
+            len(self.path_results),
+            self.path_results["seconds"].sum(),
+            best["l1_ratio"],
+            best["alpha"],
+        )
+        best_estimator = self._make_sgdc(alpha=best["alpha"], l1_ratio=best["l1_ratio"])
+        best_estimator.fit(data_array, labels)
+        return best["score"], best_estimator
+
+    def _follow_path(
+        self,
+        data_array: np.ndarray,
+        labels: np.ndarray,
+        l1_ratio: float,
+        alphas: np.ndarray,
+        folds: list[tuple[np.ndarray, np.ndarray]],
+    ) -> list[dict]:
+        """Fit one warm-started model per fold along decreasing alphas.
+
+        Parameters
+        ----------
+        data_array : np.ndarray
+            Data array to find parameters for
+        labels : np.ndarray
+            labels for classification of said data
+        l1_ratio : float
+            Elastic-net mixing parameter of the path.
+        alphas : np.ndarray
+            Regularization strengths, in decreasing order.
+        folds : list[tuple[np.ndarray, np.ndarray]]
+            Train and test indices of every fold.
+
+        Returns
+        -------
+        list[dict]
+            One record per visited path point.
+        """
+        models = [self._make_sgdc(l1_ratio=l1_ratio, warm_start=True) for _ in folds]
+        records = []
+        best_score, since_best = -np.inf, 0
+        for alpha in alphas:
+            start = time.perf_counter()
+            scores, n_nonzero = [], []
+            for model, (train, test) in zip(models, folds):
+                model.set_params(alpha=alpha)
+                model.fit(data_array[train], labels[train])
+                scores.append(model.score(data_array[test], labels[test]))
+                n_nonzero.append(np.count_nonzero(model.coef_[0]))
+            record = {
+                "l1_ratio": l1_ratio,
+                "alpha": alpha,
+                "score": np.mean(scores),
+                "n_nonzero": np.mean(n_nonzero),
+                "seconds": time.perf_counter() - start,
+            }
+            records.append(record)
+            logging.info(
+                "path point l1_ratio=%.2f alpha=%.3g: score %.3f, %.0f genes, %.2fs",
+                *record.values(),
+            )
+            if record["score"] > best_score:
+                best_score, since_best = record["score"], 0
+            else:
+                since_best += 1
+                if since_best >= self.patience:
+                    break
+        return records
+
     def _print_results(
-        self, labels: list | pd.Series, predictions: list, sgdc_gs: GridSearchCV
+        self,
+        labels: list | pd.Series,
+        predictions: list,
+        best_score: float,
+        best_estimator: SGDClassifier,
     ) -> None:
-        """Print grid search results
+        """Print search results
 
         Parameters
         ----------
@@ -142,11 +445,13 @@ class LassoSelector(BaseFeatureSelector):
             Labels used for optimization
         predictions : list
             Labels discovered after optim.
-        sgdc_gs : GridSearchCV
-            Object containing grid search results.
+        best_score : float
+            Cross-validated score of the best estimator.
+        best_estimator : SGDClassifier
+            Best estimator found by the search.
         """
-        print("Best score:", sgdc_gs.best_score_)
-        print("Best estimator:", sgdc_gs.best_estimator_)
+        print("Best score:", best_score)
+        print("Best estimator:", best_estimator)
         print("Error rate:", sum(predictions != labels) / len(labels))
         print(confusion_matrix(labels, predictions))
 
@@ -3,52 +3,103 @@
 import logging
 
 import numpy as np
-import scipy
+import scipy.sparse as sp
 
-from .base_feature_selector import BaseFeatureSelector
+from .base_feature_selector import DEFAULT_BLOCK_SIZE, ScoreBasedSelector
 
 
-class MADSelector(BaseFeatureSelector):
+def median_abs_deviation(block: np.ndarray) -> np.ndarray:
+    """Median absolute deviation of every column, overwriting the block.
+
+    Same values as `scipy.stats.median_abs_deviation(block)`, without allocating
+    full-size temporaries.
+
+    Parameters
+    ----------
+    block : np.ndarray
+        Float block (samples x features), used as scratch space.
+
+    Returns
+    -------
+    np.ndarray
+        MAD of every column.
+    """
+    block -= np.median(block, axis=0)
+    np.abs(block, out=block)
+    return np.median(block, axis=0, overwrite_input=True)
+
+
+class MADSelector(ScoreBasedSelector):
     """Feature selection based on Mean Absolute Deviation threshold
 
     Parameters
     ----------
-    threshold : float
+    threshold : float | None, optional
         Minimum threshold for variables, by default None
     n_features : int | None, optional
         Number of features to select for given task, by default None
     ceiling : int, optional
         Maximum value to prevent outliers, by default 150
+    block_size : int, optional
+        Number of features scored at once, by default DEFAULT_BLOCK_SIZE
+    n_jobs : int, optional
+        Number of threads scoring blocks, by default 1
     """
 
     def __init__(
-        self, threshold: float, ceiling: int = 150, n_features: int | None = None
+        self,
+        threshold: float | None = None,
+        ceiling: int = 150,
+        n_features: int | None = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        n_jobs: int = 1,
     ):
-        super().__init__(threshold, n_features)
+        super().__init__(threshold, n_features, block_size, n_jobs)
         self.ceiling = ceiling
         self._plot_title = "Distribution of Median Absolute Deviation (MAD)"
         self._plot_range_values: list[float] = [0, ceiling + 20]
 
-    def select_features(self, data_array: np.ndarray) -> list:
+    def compute_scores(
+        self, data_array: np.ndarray | sp.spmatrix, columns: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Median Absolute Deviation (MAD) of each gene.
+
+        Dense, memory-mapped and sparse input are all read one block of genes at a
+        time.
+
+        Parameters:
+            data_array (numpy.ndarray | scipy.sparse.spmatrix): The dataset to process.
+            columns (numpy.ndarray, optional): Indices of the genes to score.
+
+        Returns:
+            numpy.ndarray: MAD of every gene.
+        """
+        return self.blockwise_scores(data_array, median_abs_deviation, columns)
+
+    def _threshold_mask(self, scores, threshold) -> np.ndarray:
+        """Keep genes within the MAD window."""
+        return (threshold < scores) & (scores < self.ceiling)
+
+    def _admissible(self, scores) -> np.ndarray:
+        """Genes under the ceiling."""
+        return scores < self.ceiling
+
+    def select_features(self, data_array: np.ndarray | sp.spmatrix) -> np.ndarray:
         """
-        Selects features based on Median Absolute Deviation (MAD).
+        Selects features based on Median Absolute Deviation (MAD), the most variable
+        ones under the ceiling when n_features is set.
 
         Parameters:
-            data_array (numpy.ndarray): The dataset to process.
+            data_array (numpy.ndarray | scipy.sparse.spmatrix): The dataset to process.
 
         Returns:
-            list: A list of boolean values indicating selected features.
+            numpy.ndarray: A boolean mask indicating selected features.
         """
-        self.scores = scipy.stats.median_abs_deviation(data_array)
-        if self.threshold:
-            selection = [self.threshold < val < self.ceiling for val in self.scores]
-        elif self.n_features:
-            idx = np.argsort(self.scores)
-            selection = np.zeros(len(self.scores), dtype=bool)
-            valid_features = idx[self.scores[idx] < self.ceiling]
-            selection[valid_features[:min(self.n_features, len(valid_features))]] = True        
+        self.score(data_array)
+        selection = self._select(self.scores, self.threshold, self.n_features)
         logging.info(
             "removing %i genes outside the MAD window from the dataset",
-            len(selection) - sum(selection),
+            len(selection) - selection.sum(),
         )
         return selection
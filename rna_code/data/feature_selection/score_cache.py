@@ -0,0 +1,123 @@
+"""On-disk cache of feature selection scores."""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+FINGERPRINT_BLOCK_ROWS = 256
+
+
+def matrix_fingerprint(
+    data_array: np.ndarray | sp.spmatrix, columns: np.ndarray | None = None
+) -> str:
+    """Hash the shape, type and values of a matrix.
+
+    Dense and memory-mapped matrices are hashed a block of rows at a time, sparse
+    matrices through their CSR arrays.
+
+    Parameters
+    ----------
+    data_array : np.ndarray | sp.spmatrix
+        Matrix to hash.
+    columns : np.ndarray | None, optional
+        Indices of the columns of interest, hashed along with the matrix, by
+        default None (all).
+
+    Returns
+    -------
+    str
+        Hex digest identifying the matrix.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((data_array.shape, str(data_array.dtype))).encode("utf-8"))
+    if sp.issparse(data_array):
+        data_array = sp.csr_matrix(data_array)
+        data_array.sort_indices()
+        for array in (data_array.indptr, data_array.indices, data_array.data):
+            digest.update(np.ascontiguousarray(array).tobytes())
+    else:
+        for start in range(0, data_array.shape[0], FINGERPRINT_BLOCK_ROWS):
+            block = data_array[start : start + FINGERPRINT_BLOCK_ROWS]
+            digest.update(np.ascontiguousarray(block).tobytes())
+    if columns is not None:
+        digest.update(b"columns")
+        digest.update(np.asarray(columns, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+class ScoreCache:
+    """Scores of feature selectors stored as `.npy` files, keyed by the selector,
+    its scoring parameters and a fingerprint of the scored matrix.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Directory holding the cached scores.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(selector_name: str, parameters: dict, fingerprint: str) -> str:
+        """Cache key of a score computation.
+
+        Parameters
+        ----------
+        selector_name : str
+            Name of the selector class.
+        parameters : dict
+            Parameters the scores depend on.
+        fingerprint : str
+            Fingerprint of the scored matrix, see `matrix_fingerprint`.
+
+        Returns
+        -------
+        str
+            Hex digest identifying the computation.
+        """
+        payload = json.dumps(
+            [selector_name, parameters, fingerprint], sort_keys=True, default=str
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> np.ndarray | None:
+        """Read cached scores.
+
+        Parameters
+        ----------
+        key : str
+            Cache key.
+
+        Returns
+        -------
+        np.ndarray | None
+            Scores, or None on cache miss.
+        """
+        path = self.cache_dir / f"{key}.npy"
+        if not path.exists():
+            return None
+        logging.info("feature scores cache hit %s", key)
+        return np.load(path)
+
+    def save(self, key: str, scores: np.ndarray) -> None:
+        """Store scores.
+
+        Parameters
+        ----------
+        key : str
+            Cache key.
+        scores : np.ndarray
+            Score of every feature.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.cache_dir / f"{key}.npy"
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(scores))
+        os.replace(tmp_path, path)
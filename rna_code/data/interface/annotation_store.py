@@ -0,0 +1,235 @@
+"""Persistent, offline store of gene annotations (symbol and genomic position)."""
+
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pandas as pd
+
+ANNOTATION_COLUMNS = [
+    "symbol",
+    "genomic_pos.chr",
+    "genomic_pos.start",
+    "genomic_pos.end",
+    "genomic_pos.strand",
+]
+_SQL_COLUMNS = ["symbol", "chr", "start", "end", "strand"]
+_ID_COLUMNS = ["query", "ensembl_gene_id", "gene_id", "_id"]
+
+
+def strip_version(gene_ids: pd.Series) -> pd.Series:
+    """Remove the version suffix of Ensembl IDs (ENSG00000000003.15 -> ENSG00000000003).
+
+    Parameters
+    ----------
+    gene_ids : pd.Series
+        Versioned or unversioned Ensembl IDs.
+
+    Returns
+    -------
+    pd.Series
+        Unversioned Ensembl IDs.
+    """
+    return gene_ids.astype(str).str.split(".", n=1).str[0]
+
+
+def fetch_mygene(queries: list[str]) -> pd.DataFrame:
+    """Retrieve annotations from the mygene web service.
+
+    Parameters
+    ----------
+    queries : list[str]
+        Unversioned Ensembl IDs.
+
+    Returns
+    -------
+    pd.DataFrame
+        Annotations with a `query` column and ANNOTATION_COLUMNS.
+    """
+    import mygene  # pylint: disable=import-outside-toplevel
+
+    query_result = mygene.MyGeneInfo().querymany(
+        queries,
+        fields=["genomic_pos", "symbol"],
+        scopes="ensembl.gene",
+        species="human",
+        verbose=False,
+        as_dataframe=True,
+    )
+    query_result = query_result.reset_index()
+    logging.debug("Found %i symbols before duplicate removal", len(query_result))
+    return query_result.drop_duplicates(subset=["query"])
+
+
+class GeneAnnotationStore:
+    """Gene annotations keyed by unversioned Ensembl ID, persisted in SQLite.
+
+    Lookups are answered locally. Missing IDs are only sent to `fetcher` when one
+    is provided, and its answers (including IDs it does not know) are stored so that
+    every ID is fetched at most once.
+
+    Parameters
+    ----------
+    path : Path
+        SQLite database file.
+    fetcher : Callable[[list[str]], pd.DataFrame] | None, optional
+        Fallback for IDs missing from the store, e.g. `fetch_mygene`, by default
+        None (fully offline).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fetcher: Callable[[list[str]], pd.DataFrame] | None = None,
+    ):
+        self.path = path
+        self.fetcher = fetcher
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open the database, creating it if needed, and commit on exit."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS annotations ("
+                "query TEXT PRIMARY KEY, symbol TEXT, chr TEXT, "
+                "start INTEGER, end INTEGER, strand INTEGER)"
+            )
+            yield connection
+            connection.commit()
+        finally:
+            connection.close()
+
+    def __len__(self) -> int:
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM annotations").fetchone()[0]
+
+    def fingerprint(self) -> list[int]:
+        """Identify the contents of the store, which change with any insertion.
+
+        Returns
+        -------
+        list[int]
+            Number of annotations and largest row id, the latter growing whenever an
+            annotation is inserted or replaced.
+        """
+        with self._connect() as connection:
+            count, max_rowid = connection.execute(
+                "SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM annotations"
+            ).fetchone()
+        return [count, max_rowid]
+
+    def insert(self, annotations: pd.DataFrame) -> None:
+        """Insert or replace annotations.
+
+        Parameters
+        ----------
+        annotations : pd.DataFrame
+            Table with a `query` column and any of ANNOTATION_COLUMNS.
+        """
+        table = annotations.reindex(columns=["query"] + ANNOTATION_COLUMNS)
+        table = table.drop_duplicates(subset=["query"])
+        table = table.astype(object).where(table.notna(), None)
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)",
+                table.itertuples(index=False, name=None),
+            )
+
+    def import_file(self, path: Path) -> int:
+        """Populate the store from a local TSV/CSV table or JSON dump.
+
+        Files may use either the flat ANNOTATION_COLUMNS or mygene's nested
+        `genomic_pos` records. Each ID is read from the first non-empty field among
+        `query`, `ensembl_gene_id`, `gene_id` and `_id`, and its version is removed.
+
+        Parameters
+        ----------
+        path : Path
+            File to import.
+
+        Returns
+        -------
+        int
+            Number of imported annotations.
+        """
+        if path.suffix == ".json":
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            for record in records:
+                if isinstance(record.get("genomic_pos"), list):
+                    record["genomic_pos"] = record["genomic_pos"][0]
+            table = pd.json_normalize(records)
+        else:
+            table = pd.read_csv(path, sep="," if path.suffix == ".csv" else "\t")
+        table = table.rename(
+            columns={
+                column: f"genomic_pos.{column}"
+                for column in ["chr", "start", "end", "strand"]
+            }
+        )
+        gene_ids = table.reindex(columns=_ID_COLUMNS).bfill(axis=1).iloc[:, 0]
+        table["query"] = strip_version(gene_ids)
+        self.insert(table)
+        logging.info("imported %i gene annotations from %s", len(table), path)
+        return len(table)
+
+    def lookup(self, queries: pd.Series) -> pd.DataFrame:
+        """Retrieve annotations of many IDs at once, fetching missing ones through
+        the fallback if any.
+
+        Parameters
+        ----------
+        queries : pd.Series
+            Unversioned Ensembl IDs.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per distinct query, with a `query` column and
+            ANNOTATION_COLUMNS. Unknown IDs have missing values.
+        """
+        queries = pd.Series(pd.unique(queries.astype(str)), name="query")
+        found = self._select(queries)
+        missing = queries[~queries.isin(found["query"])]
+        if len(missing) and self.fetcher is not None:
+            logging.info("fetching %i missing gene annotations", len(missing))
+            try:
+                fetched = self.fetcher(missing.tolist())
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logging.warning("could not fetch gene annotations: %s", e)
+            else:
+                fetched = fetched.reindex(columns=["query"] + ANNOTATION_COLUMNS)
+                fetched = pd.concat(
+                    [fetched, pd.DataFrame({"query": missing})], ignore_index=True
+                )
+                self.insert(fetched)
+                found = self._select(queries)
+        logging.debug(
+            "%i/%i genes annotated", found["symbol"].notna().sum(), len(queries)
+        )
+        return queries.to_frame().merge(found, on="query", how="left")
+
+    def _select(self, queries: pd.Series) -> pd.DataFrame:
+        """Join queries against the annotation table."""
+        with self._connect() as connection:
+            connection.execute("CREATE TEMP TABLE queries (query TEXT PRIMARY KEY)")
+            connection.executemany(
+                "INSERT OR IGNORE INTO queries VALUES (?)",
+                ((query,) for query in queries),
+            )
+            selected_columns = ", ".join(
+                f'a.{sql} AS "{column}"'
+                for sql, column in zip(_SQL_COLUMNS, ANNOTATION_COLUMNS)
+            )
+            found = pd.read_sql_query(
+                f"SELECT q.query AS query, {selected_columns} "
+                "FROM queries q JOIN annotations a ON a.query = q.query",
+                connection,
+            )
+            connection.execute("DROP TABLE queries")
+        return found
@@ -2,11 +2,24 @@
 
 import logging
 from abc import ABC
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any, List, Optional
 
-import mygene
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
+
+from rna_code import CACHE_PATH
+from rna_code.utils.resources import StageProfiler
+
+from .annotation_store import GeneAnnotationStore, fetch_mygene, strip_version
+from .ingestion import INGESTION_DTYPE, IngestionEngine
+from .metadata_index import MetadataIndex
+from .raw_cache import RawMatrixCache
+from .scanner import EntryScanner
+
+ANNOTATION_STORE_PATH = CACHE_PATH / "gene_annotations.sqlite"
 
 
 class BaseInterface(ABC):
@@ -18,16 +31,72 @@ class BaseInterface(ABC):
         Data path
     metadata_path : Path
         Metadata file path
+    cache_dir : Path | None, optional
+        Directory of the raw matrix cache and entry index, by default a sub-directory
+        of CACHE_PATH named after the data directory. None disables both.
+    annotation_fetcher : Callable[[list[str]], pd.DataFrame] | None, optional
+        Fallback queried for the genes missing from the annotation store, by default
+        fetch_mygene. None keeps gene annotation offline.
     """
 
-    def __init__(self, data_path: Path, metadata_path: Path):
+    def __init__(
+        self,
+        data_path: Path,
+        metadata_path: Path,
+        cache_dir: Path | None = CACHE_PATH / "raw_matrix",
+        annotation_fetcher: Callable[[list[str]], pd.DataFrame] | None = fetch_mygene,
+    ):
         self.data_path = data_path
         self.metadata_path = metadata_path
+        self.cache_dir = None if cache_dir is None else cache_dir / data_path.name
         self.subsample: int | None = None
+        self.n_workers: int | None = None
+        self.dtype: np.dtype = INGESTION_DTYPE
+        self.disk_backed_path: Path | None = None
+        self.sparse: bool = False
+        self.incremental: bool = False
+        self.annotation_store = GeneAnnotationStore(
+            ANNOTATION_STORE_PATH, fetcher=annotation_fetcher
+        )
+        self.subtypes_table: Path | None = None
+        self.subtypes: list = []
         self.entries: list = []
-        self.meta_data: Any
+        self.data_array: np.ndarray | sp.csr_matrix
+        self.ingestion_engine = IngestionEngine()
+        self.profiler = StageProfiler()
+        self.metadata_index: MetadataIndex
+        self.meta_data: pd.DataFrame
         self.names: Any
 
+    def _prepare_entires(self):
+        """Select relevant entries from file system."""
+        index_path = None
+        if self.cache_dir is not None:
+            index_path = self.cache_dir / "entry_index.json"
+        self.entries = EntryScanner(index_path=index_path).scan(self.data_path)
+
+    def _load_metadata(self):
+        """Load metadata of the current entries from the metadata file index."""
+        index_path = None
+        if self.cache_dir is not None:
+            index_path = self.cache_dir / "metadata_index.csv"
+        self.metadata_index = MetadataIndex.load(self.metadata_path, index_path)
+        self.meta_data = self.metadata_index.lookup([e.stem for e in self.entries])
+
+    def find_subtypes(self):
+        """Find subtypes associated with each observation based on subtype file."""
+        if self.subtypes_table is None:
+            self.subtypes = []
+            return
+        subtypes_table = pd.read_csv(self.subtypes_table, index_col=0)
+        subtypes = pd.Series(
+            subtypes_table.iloc[:, 0].to_numpy(),
+            index=subtypes_table.index.astype(str).str[:12],
+        )
+        subtypes = subtypes[~subtypes.index.duplicated(keep="last")]
+        patient_id = self.meta_data["entity_submitter_id"].str[:12]
+        self.subtypes = patient_id.map(subtypes).fillna("Unknown").tolist()
+
     @staticmethod
     def load_patient_data(filename: str, header: int = 0) -> pd.Series:
         """
@@ -49,6 +118,67 @@ class BaseInterface(ABC):
         except FileNotFoundError:
             logging.warning("File not found: %s", filename)
 
+    def load_patients(self):
+        """Load patients based on pre computed entries"""
+        logging.info("loading samples...")
+        self.ingestion_engine = IngestionEngine(
+            n_workers=self.n_workers, dtype=self.dtype, sparse=self.sparse
+        )
+        self.data_array = self.ingestion_engine.load(
+            self.entries, out_path=self.disk_backed_path
+        )
+        logging.info(
+            "loaded %i samples, ingestion peak RSS %.1f MiB.",
+            self.data_array.shape[0],
+            self.ingestion_engine.peak_rss / 2**20,
+        )
+
+    def load_raw_matrix(self):
+        """Provide the raw matrix and gene table of the current entries, from the
+        raw matrix cache when it is up to date, from the files otherwise.
+
+        In incremental mode, an outdated cache is updated by parsing only the new or
+        changed entries.
+        """
+        if self.cache_dir is None:
+            self._load_raw_matrix_from_files()
+            return
+        cache = RawMatrixCache(self.cache_dir)
+        manifest = cache.build_manifest(self.entries)
+        cached = cache.load(manifest, self.dtype, self.sparse)
+        if cached is None and self.incremental:
+            self.ingestion_engine = IngestionEngine(
+                n_workers=self.n_workers, dtype=self.dtype, sparse=self.sparse
+            )
+            cached = cache.update(manifest, self.ingestion_engine)
+        if cached is not None:
+            self.data_array, self.names = cached
+            return
+        self._load_raw_matrix_from_files()
+        cache.save(
+            manifest, self.data_array, self.names, self.ingestion_engine.fingerprints
+        )
+
+    def cached_raw_matrix(self) -> np.ndarray | sp.csr_matrix | None:
+        """Open the raw matrix cache of the current entries without parsing them.
+
+        Returns
+        -------
+        np.ndarray | sp.csr_matrix | None
+            Raw matrix (read-only memory-mapped when dense), or None when there is
+            no up to date cache.
+        """
+        if self.cache_dir is None:
+            return None
+        cache = RawMatrixCache(self.cache_dir)
+        cached = cache.load(cache.build_manifest(self.entries), self.dtype, self.sparse)
+        return None if cached is None else cached[0]
+
+    def _load_raw_matrix_from_files(self):
+        """Parse every entry, keeping the gene table read along with the first one."""
+        self.load_patients()
+        self.names = self.ingestion_engine.genes.reset_index(drop=True)
+
     @staticmethod
     def get_gene_names_from_file(
         filename: str, header: int = 0, skiprows: Optional[List[int]] = None
@@ -77,37 +207,33 @@ class BaseInterface(ABC):
         except pd.errors.ParserError as e:
             logging.warning("Error parsing file: %s, %s", filename, e)
 
+    def _retrieve_gene_position(self):
+        """Retrieve gene symbols and positions from the annotation store"""
+        self.names["query"] = strip_version(self.names["gene_id"])
+        query_result = self.retrieve_position(self.names, store=self.annotation_store)
+        self.names = self.names.merge(query_result, on="query", how="left")
+
     @staticmethod
-    def retrieve_position(names, drop_na=False):
+    def retrieve_position(
+        names, drop_na=False, store: GeneAnnotationStore | None = None
+    ):
         """
         Retrieve genomic positions for a list of gene names.
 
         Args:
             names (pd.DataFrame): DataFrame containing gene names.
             drop_na (bool, optional): Flag to drop NA values. Defaults to False.
-            verbose (int, optional): Verbosity level.
+            store (GeneAnnotationStore, optional): Annotation store to query. Defaults
+                to the store under CACHE_PATH, falling back to mygene for misses.
 
         Returns:
             pd.DataFrame: DataFrame with retrieved genomic positions and symbols.
         """
-        mg_client = mygene.MyGeneInfo()
+        if store is None:
+            store = GeneAnnotationStore(ANNOTATION_STORE_PATH, fetcher=fetch_mygene)
 
         logging.debug("retrieving %i symbols for genes", len(names))
-        query_result = mg_client.querymany(
-            names["query"],
-            fields=["genomic_pos", "symbol"],
-            scopes="ensembl.gene",
-            species="human",
-            verbose=False,
-            as_dataframe=True,
-        )
-        query_result = query_result.reset_index()
-        logging.debug("Found %i symbols before duplicate removal", len(query_result))
-        query_result = query_result.drop_duplicates(subset=["query"])
-        logging.debug(len(query_result), "symbols after duplicate removal")
+        query_result = store.lookup(names["query"])
         if drop_na:
-            query_result["name"] = [
-                q if (pd.isna(s)) else s
-                for (s, q) in zip(query_result["symbol"], query_result["query"])
-            ]
+            query_result["name"] = query_result["symbol"].fillna(query_result["query"])
         return query_result
@@ -0,0 +1,35 @@
+"""Interface with the BRCA dataset."""
+
+from pathlib import Path
+
+from rna_code import CACHE_PATH
+
+from .gdc_interface import GDC_PROJECTS, GDCInterface
+
+
+class BRCAInterface(GDCInterface):
+    """Interface wth app and file system for the BRCA dataset.
+
+    Parameters
+    ----------
+    data_path : Path, optional
+        Path of the directory containing the data, by default BRCA_DATA_PATH
+    metadata_path : Path, optional
+        Path of the metadata file, by default BRCA_METADATA_FILE
+    cache_dir : Path | None, optional
+        Root directory of the raw matrix cache, by default CACHE_PATH / "raw_matrix"
+    """
+
+    def __init__(
+        self,
+        data_path: Path = GDC_PROJECTS["BRCA"]["data_path"],
+        metadata_path: Path = GDC_PROJECTS["BRCA"]["metadata_path"],
+        cache_dir: Path | None = CACHE_PATH / "raw_matrix",
+    ):
+        super().__init__(
+            data_path,
+            metadata_path,
+            subtypes_table=GDC_PROJECTS["BRCA"]["subtypes_table"],
+            retrieve_positions=GDC_PROJECTS["BRCA"]["retrieve_positions"],
+            cache_dir=cache_dir,
+        )
@@ -1,17 +1,13 @@
 """Interface with the CPTAC-3 dataset."""
 
-import json
-import logging
 from pathlib import Path
 
-import numpy as np
-import pandas as pd
+from rna_code import CACHE_PATH
 
-from .. import CPTAC_3_DATA_PATH, CPTAC_3_METADATA_FILE
-from .base_interface import BaseInterface
+from .gdc_interface import GDC_PROJECTS, GDCInterface
 
 
-class CPTAC3Interface(BaseInterface):
+class CPTAC3Interface(GDCInterface):
     """Interface wth app and file system for the CPTAC-3 dataset.
 
     Parameters
@@ -20,83 +16,20 @@ class CPTAC3Interface(BaseInterface):
         Path of the directory containing the data, by default CPTAC_3_DATA_PATH
     metadata_path : Path, optional
         Path of the metadata file, by default CPTAC_3_METADATA_FILE
+    cache_dir : Path | None, optional
+        Root directory of the raw matrix cache, by default CACHE_PATH / "raw_matrix"
     """
 
     def __init__(
-        self, data_path: Path = CPTAC_3_DATA_PATH, metadata_path: Path = CPTAC_3_METADATA_FILE
+        self,
+        data_path: Path = GDC_PROJECTS["CPTAC-3"]["data_path"],
+        metadata_path: Path = GDC_PROJECTS["CPTAC-3"]["metadata_path"],
+        cache_dir: Path | None = CACHE_PATH / "raw_matrix",
     ):
-        super().__init__(data_path, metadata_path)
-        self.subtypes_table: Path = None  # provided by supervisor
-        self.subtypes: list = []
-        self.data_array: np.ndarray
-
-    def _prepare_entires(self):
-        """Select relevant entries from file system."""
-        all_files = list(self.data_path.rglob("*"))
-        self.entries = [
-            file
-            for file in all_files
-            if str(file).endswith("augmented_star_gene_counts.tsv")
-        ]
-        self.entries.sort()
-
-    def _load_metadata(self):
-        """Load metadata based on filepath."""
-        with open(self.metadata_path, "r", encoding="utf-8") as f:
-            self.meta_data = json.load(f)
-
-    def find_subtypes(self):
-        """Find subtypes associated with each observation based on subtype file."""
-        # Step 1: Construct a mapping from file_name to entity_submitter_id
-        file_to_id = {}
-        for item in self.meta_data:
-            file_name = item["file_name"][:-4]  # remove the .tsv extension
-            entity_id = item["associated_entities"][0]["entity_submitter_id"]
-            file_to_id[file_name] = entity_id
-        # Step 2: For each file name in metadata["sequence_names"], find its corresponding entity_submitter_id
-        patient_id = []
-        for file_name in self.entries:
-            if file_name.stem in file_to_id.keys():
-                patient_id.append(file_to_id[file_name.stem])
-
-
-    def load_patients(self):
-        """Load patients based on pre computed entries"""
-        logging.info("loading samples...")
-        self.data_array = np.array(
-            [self.load_patient_data(e, header=5) for e in self.entries]
+        super().__init__(
+            data_path,
+            metadata_path,
+            subtypes_table=GDC_PROJECTS["CPTAC-3"]["subtypes_table"],
+            retrieve_positions=GDC_PROJECTS["CPTAC-3"]["retrieve_positions"],
+            cache_dir=cache_dir,
         )
-        logging.info("loaded %i samples.", len(self.data_array))
-
-    def _retrieve_gene_position(self):
-        """Use mygene to retrieve gene position"""
-        self.names["query"] = self.names["gene_id"].apply(lambda x: x.split(".")[0])
-        query_result = self.retrieve_position(self.names)
-        self.names = self.names.merge(query_result, on="query", how="left")
-
-    def setup(self):
-        """Perform all necessary steps to provide with a dataset."""
-        self._load_metadata()
-        self._prepare_entires()
-        if self.subsample is not None:
-            self.entries = self.entries[: self.subsample]
-        self.load_patients()
-        self.names = pd.DataFrame(
-            self.get_gene_names_from_file(
-                self.entries[0], header=1, skiprows=[2, 3, 4, 5]
-            )
-        )
-        #self.find_subtypes() # not defined for cptac-3
-        #self._retrieve_gene_position()
-
-    @property
-    def entry_names(self) -> list[str]:
-        """Get entries names
-
-        Returns
-        -------
-        list[str]
-            List containing the name for each observation
-        """
-
-        return [str(e).split("/")[9] for e in self.entries]
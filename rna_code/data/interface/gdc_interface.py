@@ -0,0 +1,159 @@
+"""Interface with any GDC project of STAR gene count files."""
+
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from rna_code import CACHE_PATH
+
+from .. import (
+    BRCA_DATA_PATH,
+    BRCA_METADATA_FILE,
+    BRCA_SUBTYPES_FILE,
+    CPTAC_3_DATA_PATH,
+    CPTAC_3_METADATA_FILE,
+)
+from .annotation_store import fetch_mygene
+from .base_interface import BaseInterface
+from .raw_cache import RawMatrixCache
+
+GDC_PROJECTS: dict[str, dict] = {
+    "BRCA": {
+        "data_path": BRCA_DATA_PATH,
+        "metadata_path": BRCA_METADATA_FILE,
+        "subtypes_table": BRCA_SUBTYPES_FILE,  # provided by supervisor
+        "retrieve_positions": True,
+    },
+    "CPTAC-3": {
+        "data_path": CPTAC_3_DATA_PATH,
+        "metadata_path": CPTAC_3_METADATA_FILE,
+        "subtypes_table": None,  # not defined for cptac-3
+        "retrieve_positions": False,
+    },
+}
+
+
+class GDCInterface(BaseInterface):
+    """Interface with app and file system for a GDC download of STAR gene counts.
+
+    The download is expected to hold one directory per file, as produced by the GDC
+    client, and a metadata cart describing them.
+
+    Parameters
+    ----------
+    data_path : Path
+        Path of the directory containing the data
+    metadata_path : Path
+        Path of the metadata file
+    subtypes_table : Path | None, optional
+        Table mapping patient barcodes to subtypes, by default None
+    retrieve_positions : bool, optional
+        Whether to annotate genes with symbols and genomic positions, by default True
+    cache_dir : Path | None, optional
+        Root directory of the raw matrix cache, by default CACHE_PATH / "raw_matrix"
+    annotation_fetcher : Callable[[list[str]], pd.DataFrame] | None, optional
+        Fallback queried for the genes missing from the annotation store, by default
+        fetch_mygene. None keeps gene annotation offline.
+    """
+
+    def __init__(
+        self,
+        data_path: Path,
+        metadata_path: Path,
+        subtypes_table: Path | None = None,
+        retrieve_positions: bool = True,
+        cache_dir: Path | None = CACHE_PATH / "raw_matrix",
+        annotation_fetcher: Callable[[list[str]], pd.DataFrame] | None = fetch_mygene,
+    ):
+        super().__init__(data_path, metadata_path, cache_dir, annotation_fetcher)
+        self.subtypes_table = subtypes_table
+        self.retrieve_positions = retrieve_positions
+
+    @classmethod
+    def from_project(cls, project: str, **kwargs) -> "GDCInterface":
+        """Build the interface of a project listed in GDC_PROJECTS.
+
+        Parameters
+        ----------
+        project : str
+            Name of the project, e.g. "BRCA".
+        **kwargs
+            Overrides of the project configuration.
+
+        Returns
+        -------
+        GDCInterface
+            Interface of the project.
+
+        Raises
+        ------
+        NotImplementedError
+            If the project is not configured.
+        """
+        if project not in GDC_PROJECTS:
+            raise NotImplementedError(f"No GDC project configured as {project}")
+        return cls(**{**GDC_PROJECTS[project], **kwargs})
+
+    def _select_entries(self):
+        """Scan the data directory and keep the first `subsample` entries."""
+        self._prepare_entires()
+        if self.subsample is not None:
+            self.entries = self.entries[: self.subsample]
+
+    def source_key(self) -> str:
+        """Key of the dataset `setup` would provide, without loading it.
+
+        It hashes the manifest of the entries, metadata and subtypes files with the
+        interface settings and, when gene positions are retrieved, the fingerprint
+        of the annotation store and whether missing genes are fetched, so it changes
+        whenever any of them does.
+
+        Returns
+        -------
+        str
+            Hex digest identifying the raw dataset.
+        """
+        self._select_entries()
+        sources = [self.metadata_path, self.subtypes_table]
+        manifest = RawMatrixCache.build_manifest(
+            self.entries + [path for path in sources if path is not None]
+        )
+        settings = [
+            str(np.dtype(self.dtype)),
+            self.sparse,
+            self.retrieve_positions,
+        ]
+        if self.retrieve_positions:
+            settings.append(self.annotation_store.fingerprint())
+            settings.append(self.annotation_store.fetcher is not None)
+        return RawMatrixCache.manifest_key(manifest + [settings])
+
+    def setup(self):
+        """Perform all necessary steps to provide with a dataset, each profiled as a
+        stage of `profiler`."""
+        with self.profiler.stage("scan", lambda: (len(self.entries), None)):
+            self._select_entries()
+        with self.profiler.stage("metadata", lambda: (len(self.meta_data), None)):
+            self._load_metadata()
+        with self.profiler.stage("matrix", lambda: self.data_array.shape):
+            self.load_raw_matrix()
+        with self.profiler.stage("subtypes", lambda: (len(self.subtypes), None)):
+            self.find_subtypes()
+        if self.retrieve_positions:
+            with self.profiler.stage(
+                "gene_positions", lambda: (None, len(self.names))
+            ):
+                self._retrieve_gene_position()
+
+    @property
+    def entry_names(self) -> list[str]:
+        """Get entries names, the name of the download directory of each file.
+
+        Returns
+        -------
+        list[str]
+            List containing the name for each observation
+        """
+        return [e.relative_to(self.data_path).parts[0] for e in self.entries]
@@ -0,0 +1,321 @@
+"""Parallel ingestion of STAR gene count files into a sample x gene matrix."""
+
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from rna_code.utils.resources import RSSSampler, process_pool_context
+
+# `augmented_star_gene_counts.tsv` layout: a comment line, the column header, then
+# the four N_* summary lines before the first gene.
+STAR_COUNTS_SKIPROWS = 6
+GENE_ID_COLUMN = 0
+GENE_NAME_COLUMN = 1
+GENE_TYPE_COLUMN = 2
+UNSTRANDED_COLUMN = 3
+GENE_TABLE_COLUMNS = ["gene_id", "gene_name", "gene_type"]
+INGESTION_DTYPE = np.float32
+
+
+def gene_fingerprint(gene_ids) -> str:
+    """Hash an ordered list of gene IDs.
+
+    Parameters
+    ----------
+    gene_ids : Iterable[str]
+        Gene IDs, in file order.
+
+    Returns
+    -------
+    str
+        Hex digest, equal for two files only if they list the same genes in the
+        same order.
+    """
+    payload = "\n".join(gene_ids).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def read_gene_counts(
+    filename: str | Path,
+    column: int = UNSTRANDED_COLUMN,
+    dtype: np.dtype = INGESTION_DTYPE,
+) -> pd.Series:
+    """Read a single count column from a STAR gene count file, indexed by gene ID.
+
+    Only the gene ID and requested count columns are parsed, counts directly into
+    the requested dtype.
+
+    Parameters
+    ----------
+    filename : str | Path
+        Path to the data file.
+    column : int, optional
+        Index of the column to read, by default UNSTRANDED_COLUMN
+    dtype : np.dtype, optional
+        Type of the returned values, by default INGESTION_DTYPE
+
+    Returns
+    -------
+    pd.Series
+        Counts for every gene of the file, indexed by gene ID.
+    """
+    data = pd.read_table(
+        filename,
+        header=None,
+        skiprows=STAR_COUNTS_SKIPROWS,
+        usecols=[GENE_ID_COLUMN, column],
+        dtype={GENE_ID_COLUMN: str, column: dtype},
+        engine="c",
+    )
+    return pd.Series(
+        data[column].to_numpy(), index=pd.Index(data[GENE_ID_COLUMN], name="gene_id")
+    )
+
+
+def read_genes_and_counts(
+    filename: str | Path,
+    column: int = UNSTRANDED_COLUMN,
+    dtype: np.dtype = INGESTION_DTYPE,
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """Read the gene table and a count column of a STAR gene count file at once.
+
+    Parameters
+    ----------
+    filename : str | Path
+        Path to the data file.
+    column : int, optional
+        Index of the column to read, by default UNSTRANDED_COLUMN
+    dtype : np.dtype, optional
+        Type of the returned values, by default INGESTION_DTYPE
+
+    Returns
+    -------
+    tuple[pd.DataFrame, np.ndarray]
+        Gene table with GENE_TABLE_COLUMNS and counts, both in file order.
+    """
+    data = pd.read_table(
+        filename,
+        header=None,
+        skiprows=STAR_COUNTS_SKIPROWS,
+        usecols=[GENE_ID_COLUMN, GENE_NAME_COLUMN, GENE_TYPE_COLUMN, column],
+        dtype={
+            GENE_ID_COLUMN: str,
+            GENE_NAME_COLUMN: str,
+            GENE_TYPE_COLUMN: str,
+            column: dtype,
+        },
+        engine="c",
+    )
+    genes = data[[GENE_ID_COLUMN, GENE_NAME_COLUMN, GENE_TYPE_COLUMN]]
+    genes.columns = GENE_TABLE_COLUMNS
+    return genes, data[column].to_numpy()
+
+
+def read_sample(
+    filename: str | Path,
+    column: int = UNSTRANDED_COLUMN,
+    dtype: np.dtype = INGESTION_DTYPE,
+) -> tuple[np.ndarray, str]:
+    """Read the counts of a file along with the fingerprint of its gene order.
+
+    Parameters
+    ----------
+    filename : str | Path
+        Path to the data file.
+    column : int, optional
+        Index of the column to read, by default UNSTRANDED_COLUMN
+    dtype : np.dtype, optional
+        Type of the returned values, by default INGESTION_DTYPE
+
+    Returns
+    -------
+    tuple[np.ndarray, str]
+        Counts in file order and the gene fingerprint of the file.
+    """
+    counts = read_gene_counts(filename, column, dtype)
+    return counts.to_numpy(), gene_fingerprint(counts.index)
+
+
+class IngestionEngine:
+    """Load the count column of many files into a preallocated matrix, using a pool
+    of worker processes.
+
+    Samples are streamed into their row as they are parsed, so that peak memory is
+    one matrix plus a few in-flight rows. The output matches stacking
+    `BaseInterface.load_patient_data` for every entry, stored as float32 by default
+    (integer counts are represented exactly up to 2**24).
+
+    Every file is checked against the reference gene order during the same pass,
+    by comparing gene ID fingerprints. The few files whose order differs are
+    re-read and aligned on the reference gene IDs. The gene table (IDs, names and
+    types) is taken from the same read as the counts of the reference file.
+
+    Parameters
+    ----------
+    n_workers : int | None, optional
+        Number of worker processes, by default None (one per CPU). With 1, files are
+        read in the calling process.
+    chunksize : int, optional
+        Number of files sent to a worker at once, by default 8
+    dtype : np.dtype, optional
+        Type of the output matrix, by default INGESTION_DTYPE
+    sparse : bool, optional
+        Whether to return a CSR matrix holding only non-zero counts, by default False
+    """
+
+    def __init__(
+        self,
+        n_workers: int | None = None,
+        chunksize: int = 8,
+        dtype: np.dtype = INGESTION_DTYPE,
+        sparse: bool = False,
+    ):
+        self.n_workers: int = n_workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.dtype = np.dtype(dtype)
+        self.sparse = sparse
+        self.gene_ids: pd.Index = pd.Index([], name="gene_id")
+        self.genes: pd.DataFrame = pd.DataFrame(columns=GENE_TABLE_COLUMNS)
+        self.fingerprints: list[str] = []
+        self.realigned: list[Path] = []
+        self.files_per_second: float = 0.0
+        self.peak_rss: int = 0
+
+    def load(
+        self,
+        entries: list[Path],
+        out_path: Path | None = None,
+        gene_ids: pd.Index | None = None,
+    ) -> np.ndarray | sp.csr_matrix:
+        """Load every entry as one row of the output matrix.
+
+        Parameters
+        ----------
+        entries : list[Path]
+            Files to load, in row order.
+        out_path : Path | None, optional
+            `.npy` file backing the output matrix, by default None (in memory). Not
+            available in sparse mode.
+        gene_ids : pd.Index | None, optional
+            Reference gene order of the columns, by default None (the order of the
+            first entry, whose gene table is then kept in `genes`).
+
+        Returns
+        -------
+        np.ndarray | sp.csr_matrix
+            Matrix of shape (len(entries), n_genes), memory-mapped when `out_path`
+            is given, CSR in sparse mode.
+        """
+        if self.sparse and out_path is not None:
+            raise ValueError("Sparse ingestion cannot be disk-backed")
+        self.fingerprints = []
+        self.realigned = []
+        start = time.perf_counter()
+        with RSSSampler() as sampler:
+            data_array = self._assemble(entries, out_path, gene_ids)
+        elapsed = time.perf_counter() - start
+        self.files_per_second = len(entries) / elapsed if elapsed > 0 else float("inf")
+        self.peak_rss = sampler.peak_rss
+        logging.info(
+            "ingested %i files in %.2fs (%.1f files/s, %i workers, "
+            "peak RSS of the ingesting process %.1f MiB)",
+            len(entries),
+            elapsed,
+            self.files_per_second,
+            self.n_workers,
+            self.peak_rss / 2**20,
+        )
+        if self.realigned:
+            logging.warning(
+                "%i files had a different gene order and were realigned",
+                len(self.realigned),
+            )
+        return data_array
+
+    def _assemble(
+        self, entries: list[Path], out_path: Path | None, gene_ids: pd.Index | None
+    ) -> np.ndarray | sp.csr_matrix:
+        """Parse the entries into the output matrix, see `load`."""
+        if gene_ids is None and entries:
+            self.genes, first = read_genes_and_counts(entries[0], dtype=self.dtype)
+            gene_ids = self.genes["gene_id"]
+            samples = chain(
+                [(first, gene_fingerprint(gene_ids))], self._map(entries[1:])
+            )
+        else:
+            self.genes = pd.DataFrame(
+                {"gene_id": [] if gene_ids is None else gene_ids}
+            ).reindex(columns=GENE_TABLE_COLUMNS)
+            samples = self._map(entries)
+        self.gene_ids = pd.Index([] if gene_ids is None else gene_ids, name="gene_id")
+        rows = self._checked_rows(entries, samples)
+
+        shape = (len(entries), len(self.gene_ids))
+        if self.sparse:
+            data_array = self._assemble_sparse(shape, rows)
+        else:
+            if out_path is None:
+                data_array = np.empty(shape, dtype=self.dtype)
+            else:
+                out_path.parent.mkdir(parents=True, exist_ok=True)
+                data_array = np.lib.format.open_memmap(
+                    out_path, mode="w+", dtype=self.dtype, shape=shape
+                )
+            for i, counts in enumerate(rows):
+                data_array[i] = counts
+            if out_path is not None:
+                data_array.flush()
+        return data_array
+
+    def _checked_rows(self, entries: list[Path], samples) -> Iterator[np.ndarray]:
+        """Yield the counts of every entry in reference gene order."""
+        reference = gene_fingerprint(self.gene_ids)
+        for entry, (counts, fingerprint) in zip(entries, samples):
+            self.fingerprints.append(fingerprint)
+            if fingerprint != reference:
+                counts = self._realign(entry)
+            yield counts
+
+    def _realign(self, entry: Path) -> np.ndarray:
+        """Re-read an entry and join its counts on the reference gene IDs."""
+        self.realigned.append(entry)
+        counts = read_gene_counts(entry, dtype=self.dtype)
+        counts = counts[~counts.index.duplicated()].reindex(self.gene_ids)
+        missing = counts.isna().sum()
+        if missing:
+            logging.warning("%i genes missing from %s, set to 0", missing, entry)
+        return counts.fillna(0).to_numpy(dtype=self.dtype)
+
+    def _assemble_sparse(self, shape, rows) -> sp.csr_matrix:
+        """Keep the non-zero counts of every row and build a CSR matrix."""
+        indices, values = [np.empty(0, np.int32)], [np.empty(0, self.dtype)]
+        for counts in rows:
+            non_zero = np.flatnonzero(counts)
+            indices.append(non_zero.astype(np.int32))
+            values.append(counts[non_zero])
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in indices[1:]], out=indptr[1:])
+        return sp.csr_matrix(
+            (np.concatenate(values), np.concatenate(indices), indptr), shape=shape
+        )
+
+    def _map(self, entries: list[Path]):
+        """Read entries in order, in parallel when more than one worker is set."""
+        read = partial(read_sample, dtype=self.dtype)
+        if self.n_workers == 1 or len(entries) < 2:
+            yield from map(read, entries)
+            return
+        with ProcessPoolExecutor(
+            max_workers=self.n_workers, mp_context=process_pool_context()
+        ) as executor:
+            yield from executor.map(read, entries, chunksize=self.chunksize)
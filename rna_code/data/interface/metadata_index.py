@@ -0,0 +1,138 @@
+"""Columnar index of GDC metadata cart files."""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+import pandas as pd
+
+METADATA_COLUMNS = [
+    "file_name",
+    "file_id",
+    "case_id",
+    "entity_id",
+    "entity_submitter_id",
+    "sample_type",
+]
+
+
+class MetadataIndex:
+    """Typed table of the metadata cart, indexed by file stem.
+
+    Each cart record is flattened once into METADATA_COLUMNS. Rows are looked up
+    by the stem of the data file they describe (`file_name` without `.tsv`), which
+    is a hash lookup on the table index.
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        Metadata table indexed by file stem, with METADATA_COLUMNS.
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+
+    @classmethod
+    def from_cart(cls, metadata_path: Path) -> "MetadataIndex":
+        """Parse a metadata cart JSON file.
+
+        Parameters
+        ----------
+        metadata_path : Path
+            Path of the cart JSON file.
+
+        Returns
+        -------
+        MetadataIndex
+            Index of the cart.
+        """
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        rows = []
+        for item in records:
+            entity = (item.get("associated_entities") or [{}])[0]
+            samples = ((item.get("cases") or [{}])[0]).get("samples") or [{}]
+            rows.append(
+                (
+                    item["file_name"],
+                    item.get("file_id"),
+                    entity.get("case_id"),
+                    entity.get("entity_id"),
+                    entity.get("entity_submitter_id"),
+                    samples[0].get("sample_type"),
+                )
+            )
+        table = pd.DataFrame(rows, columns=METADATA_COLUMNS, dtype="string")
+        table.index = pd.Index(
+            [Path(file_name).stem for file_name in table["file_name"]], name="stem"
+        )
+        table = table[~table.index.duplicated()]
+        return cls(table)
+
+    @classmethod
+    def load(
+        cls, metadata_path: Path, index_path: Path | None = None
+    ) -> "MetadataIndex":
+        """Load the index of a cart, from its persisted copy when still up to date.
+
+        Parameters
+        ----------
+        metadata_path : Path
+            Path of the cart JSON file.
+        index_path : Path | None, optional
+            CSV file persisting the index, by default None (no persistence). The
+            cart size and mtime are stored alongside to invalidate it.
+
+        Returns
+        -------
+        MetadataIndex
+            Index of the cart.
+        """
+        if index_path is None:
+            return cls.from_cart(metadata_path)
+        stat = os.stat(metadata_path)
+        source = {
+            "path": str(metadata_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        source_path = index_path.with_suffix(".json")
+        try:
+            with open(source_path, "r", encoding="utf-8") as f:
+                up_to_date = json.load(f) == source
+        except (FileNotFoundError, json.JSONDecodeError):
+            up_to_date = False
+        if up_to_date:
+            table = pd.read_csv(index_path, index_col="stem", dtype="string")
+            return cls(table)
+
+        logging.info("indexing metadata file %s", metadata_path)
+        index = cls.from_cart(metadata_path)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index.table.to_csv(index_path)
+        with open(source_path, "w", encoding="utf-8") as f:
+            json.dump(source, f)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, stem: str) -> pd.Series:
+        return self.table.loc[stem]
+
+    def lookup(self, stems: list[str]) -> pd.DataFrame:
+        """Metadata of many files at once.
+
+        Parameters
+        ----------
+        stems : list[str]
+            File stems, e.g. `[entry.stem for entry in entries]`.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per stem, in order. Files absent from the cart have missing
+            values.
+        """
+        return self.table.reindex(stems).reset_index(drop=True)
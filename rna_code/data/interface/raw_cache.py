@@ -0,0 +1,313 @@
+"""On-disk cache of the raw sample x gene matrix built from a data directory."""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .ingestion import IngestionEngine
+
+MATRIX_FILE = "matrix.npy"
+SPARSE_MATRIX_FILE = "matrix.npz"
+GENES_FILE = "genes.csv"
+MANIFEST_FILE = "manifest.json"
+COPY_BLOCK_ROWS = 256
+
+
+class RawMatrixCache:
+    """Binary cache of the raw matrix, its gene table and its entry list.
+
+    The cache is keyed by a manifest holding (path, size, mtime) for every entry, so
+    it invalidates itself whenever a file is added, removed or touched. The gene
+    order fingerprint of every entry is stored in the manifest as well. Dense
+    matrices are stored as a `.npy` file and opened memory-mapped, CSR matrices as a
+    `.npz` file.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Directory holding the cached files.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def build_manifest(entries: list[Path]) -> list[dict]:
+        """Describe entries by path, size and modification time.
+
+        Parameters
+        ----------
+        entries : list[Path]
+            Files making up the matrix, in row order.
+
+        Returns
+        -------
+        list[dict]
+            One record per entry.
+        """
+        manifest = []
+        for entry in entries:
+            stat = os.stat(entry)
+            manifest.append(
+                {"path": str(entry), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            )
+        return manifest
+
+    @staticmethod
+    def manifest_key(manifest: list[dict]) -> str:
+        """Hash a manifest into a cache key.
+
+        Parameters
+        ----------
+        manifest : list[dict]
+            Manifest as returned by `build_manifest`.
+
+        Returns
+        -------
+        str
+            Hex digest identifying the manifest.
+        """
+        payload = json.dumps(manifest, sort_keys=True).encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    def load(
+        self, manifest: list[dict], dtype: np.dtype | None = None, sparse: bool = False
+    ) -> tuple[np.ndarray | sp.csr_matrix, pd.DataFrame] | None:
+        """Open the cached matrix if it was built from the given manifest.
+
+        Parameters
+        ----------
+        manifest : list[dict]
+            Manifest of the current entries.
+        dtype : np.dtype | None, optional
+            Required type of the matrix, by default None (any).
+        sparse : bool, optional
+            Whether a CSR matrix is required rather than a dense one, by default False
+
+        Returns
+        -------
+        tuple[np.ndarray | sp.csr_matrix, pd.DataFrame] | None
+            Matrix (read-only memory-mapped when dense) and gene table, or None on
+            cache miss.
+        """
+        stored = self._read_manifest()
+        if stored is None or stored["key"] != self.manifest_key(manifest):
+            logging.info("raw matrix cache miss in %s", self.cache_dir)
+            return None
+        data_array = self._open_matrix(dtype, sparse)
+        if data_array is None:
+            logging.info("raw matrix cache in %s has another format", self.cache_dir)
+            return None
+        names = pd.read_csv(self.cache_dir / GENES_FILE)
+        logging.info("raw matrix cache hit in %s", self.cache_dir)
+        return data_array, names
+
+    def save(
+        self,
+        manifest: list[dict],
+        data_array: np.ndarray | sp.csr_matrix,
+        names: pd.DataFrame,
+        fingerprints: list[str] | None = None,
+    ) -> None:
+        """Store a matrix and its gene table under the given manifest.
+
+        The manifest is written last so that an interrupted save is a cache miss.
+
+        Parameters
+        ----------
+        manifest : list[dict]
+            Manifest of the entries the matrix was built from.
+        data_array : np.ndarray | sp.csr_matrix
+            Raw sample x gene matrix.
+        names : pd.DataFrame
+            Gene table matching the matrix columns.
+        fingerprints : list[str] | None, optional
+            Gene order fingerprint of every entry, by default None
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        (self.cache_dir / MANIFEST_FILE).unlink(missing_ok=True)
+        self._save_matrix(data_array)
+        self._replace(
+            self.cache_dir / GENES_FILE, lambda f: names.to_csv(f, index=False)
+        )
+        self._write_manifest(manifest, fingerprints)
+
+    def update(
+        self, manifest: list[dict], engine: IngestionEngine
+    ) -> tuple[np.ndarray | sp.csr_matrix, pd.DataFrame] | None:
+        """Bring the cached matrix up to date with the given manifest, parsing only
+        the entries that are new or changed since the last ingestion.
+
+        New files are aligned on the cached gene order. Rows of unchanged entries
+        are copied from the cached matrix, rows of deleted entries are dropped, and
+        the result is rewritten in manifest order.
+
+        Parameters
+        ----------
+        manifest : list[dict]
+            Manifest of the current entries.
+        engine : IngestionEngine
+            Engine parsing the new files, whose dtype and sparsity must match the
+            cached matrix.
+
+        Returns
+        -------
+        tuple[np.ndarray | sp.csr_matrix, pd.DataFrame] | None
+            Matrix and gene table as returned by `load`, or None when there is no
+            previous ingestion of the right format to start from.
+        """
+        stored = self._read_manifest()
+        previous_array = None
+        if stored is not None:
+            previous_array = self._open_matrix(engine.dtype, engine.sparse)
+        if previous_array is None:
+            return None
+        current = {record["path"]: record for record in manifest}
+        previous = {record["path"]: row for row, record in enumerate(stored["entries"])}
+        unchanged = {
+            record["path"]
+            for record in stored["entries"]
+            if current.get(record["path"]) == record
+        }
+        kept = [
+            (position, previous[record["path"]])
+            for position, record in enumerate(manifest)
+            if record["path"] in unchanged
+        ]
+        parsed_positions = [
+            position
+            for position, record in enumerate(manifest)
+            if record["path"] not in unchanged
+        ]
+        logging.info(
+            "incremental ingestion: %i rows kept, %i files to parse, %i rows dropped",
+            len(kept),
+            len(parsed_positions),
+            len(stored["entries"]) - len(kept),
+        )
+
+        names = pd.read_csv(self.cache_dir / GENES_FILE)
+        parsed = engine.load(
+            [Path(manifest[i]["path"]) for i in parsed_positions],
+            gene_ids=pd.Index(names["gene_id"]),
+        )
+        stored_fingerprints = stored.get("gene_fingerprints")
+        fingerprints = None
+        if stored_fingerprints is not None:
+            fingerprints = [None] * len(manifest)
+            for position, row in kept:
+                fingerprints[position] = stored_fingerprints[row]
+            for position, fingerprint in zip(parsed_positions, engine.fingerprints):
+                fingerprints[position] = fingerprint
+
+        (self.cache_dir / MANIFEST_FILE).unlink()
+        if engine.sparse:
+            self._merge_sparse(previous_array, kept, parsed_positions, parsed)
+        else:
+            self._merge_dense(previous_array, kept, parsed_positions, parsed)
+        del previous_array
+        self._write_manifest(manifest, fingerprints)
+        return self.load(manifest, engine.dtype, engine.sparse)
+
+    def _merge_dense(self, previous_array, kept, parsed_positions, parsed) -> None:
+        """Rewrite the dense matrix from kept and parsed rows, by row blocks."""
+        tmp_path = self.cache_dir / (MATRIX_FILE + ".tmp")
+        data_array = np.lib.format.open_memmap(
+            tmp_path,
+            mode="w+",
+            dtype=previous_array.dtype,
+            shape=(len(kept) + len(parsed_positions), previous_array.shape[1]),
+        )
+        for start in range(0, len(kept), COPY_BLOCK_ROWS):
+            positions, rows = zip(*kept[start : start + COPY_BLOCK_ROWS])
+            data_array[list(positions)] = previous_array[list(rows)]
+        if parsed_positions:
+            data_array[parsed_positions] = parsed
+        data_array.flush()
+        del data_array
+        os.replace(tmp_path, self.cache_dir / MATRIX_FILE)
+
+    def _merge_sparse(self, previous_array, kept, parsed_positions, parsed) -> None:
+        """Rewrite the CSR matrix from kept and parsed rows."""
+        positions = [position for position, _ in kept] + parsed_positions
+        blocks = [previous_array[[row for _, row in kept]]]
+        if parsed_positions:
+            blocks.append(sp.csr_matrix(parsed))
+        stacked = sp.vstack(blocks, format="csr")
+        self._save_matrix(stacked[np.argsort(positions)])
+
+    def _open_matrix(
+        self, dtype: np.dtype | None, sparse: bool
+    ) -> np.ndarray | sp.csr_matrix | None:
+        """Open the stored matrix if it has the requested format."""
+        path = self.cache_dir / (SPARSE_MATRIX_FILE if sparse else MATRIX_FILE)
+        if not path.exists():
+            return None
+        if sparse:
+            data_array = sp.load_npz(path).tocsr()
+        else:
+            data_array = np.load(path, mmap_mode="r")
+        if dtype is not None and data_array.dtype != dtype:
+            return None
+        return data_array
+
+    def _save_matrix(self, data_array: np.ndarray | sp.csr_matrix) -> None:
+        """Store the matrix in the file matching its format, removing the other."""
+        if sp.issparse(data_array):
+            self._replace(
+                self.cache_dir / SPARSE_MATRIX_FILE,
+                lambda f: sp.save_npz(f, data_array, compressed=False),
+            )
+            (self.cache_dir / MATRIX_FILE).unlink(missing_ok=True)
+        else:
+            self._replace(
+                self.cache_dir / MATRIX_FILE, lambda f: np.save(f, data_array)
+            )
+            (self.cache_dir / SPARSE_MATRIX_FILE).unlink(missing_ok=True)
+
+    def _write_manifest(
+        self, manifest: list[dict], fingerprints: list[str] | None = None
+    ) -> None:
+        """Write the manifest record, marking the cached files as valid."""
+        record = {
+            "key": self.manifest_key(manifest),
+            "entries": manifest,
+            "gene_fingerprints": fingerprints,
+        }
+        self._replace(
+            self.cache_dir / MANIFEST_FILE,
+            lambda f: f.write(json.dumps(record).encode("utf-8")),
+        )
+
+    def stored_fingerprints(self) -> list[str] | None:
+        """Gene order fingerprints of the cached entries, if known.
+
+        Returns
+        -------
+        list[str] | None
+            One fingerprint per cached row.
+        """
+        stored = self._read_manifest()
+        return None if stored is None else stored.get("gene_fingerprints")
+
+    def _read_manifest(self) -> dict | None:
+        """Read the stored manifest record, if any."""
+        try:
+            with open(self.cache_dir / MANIFEST_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _replace(path: Path, write) -> None:
+        """Write through a temporary file then atomically move it into place."""
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,125 @@
+"""Fast discovery of data files in GDC download trees."""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+ENTRY_SUFFIX = "augmented_star_gene_counts.tsv"
+PRUNED_DIRECTORIES = frozenset({"logs"})
+
+
+class EntryScanner:
+    """Find data files below a directory, walking it with `os.scandir`.
+
+    Matching is done on file names during the walk, and sub-directories such as the
+    `logs` folder of every GDC download are never entered. When an index path is
+    given, the content of every directory is persisted along with its mtime, so that
+    later scans only stat directories and re-list the ones that changed.
+
+    Parameters
+    ----------
+    suffix : str, optional
+        Suffix of the files to find, by default ENTRY_SUFFIX
+    index_path : Path | None, optional
+        JSON file persisting the directory index, by default None
+    pruned_directories : frozenset[str], optional
+        Names of directories not to descend into, by default PRUNED_DIRECTORIES
+    """
+
+    def __init__(
+        self,
+        suffix: str = ENTRY_SUFFIX,
+        index_path: Path | None = None,
+        pruned_directories: frozenset[str] = PRUNED_DIRECTORIES,
+    ):
+        self.suffix = suffix
+        self.index_path = index_path
+        self.pruned_directories = pruned_directories
+
+    def scan(self, root: Path) -> list[Path]:
+        """List matching files below root.
+
+        Parameters
+        ----------
+        root : Path
+            Directory to scan.
+
+        Returns
+        -------
+        list[Path]
+            Sorted matching files.
+        """
+        start = time.perf_counter()
+        previous = self._load_index(root)
+        index: dict[str, dict] = {}
+        rescanned = 0
+        stack = [str(root)]
+        while stack:
+            directory = stack.pop()
+            mtime_ns = os.stat(directory).st_mtime_ns
+            record = previous.get(directory)
+            if record is None or record["mtime_ns"] != mtime_ns:
+                record = self._list_directory(directory, mtime_ns)
+                rescanned += 1
+            index[directory] = record
+            stack.extend(os.path.join(directory, name) for name in record["dirs"])
+        self._save_index(root, index)
+
+        entries = sorted(
+            Path(directory, name)
+            for directory, record in index.items()
+            for name in record["files"]
+        )
+        logging.info(
+            "found %i entries in %i directories (%i rescanned) in %.2fs",
+            len(entries),
+            len(index),
+            rescanned,
+            time.perf_counter() - start,
+        )
+        return entries
+
+    def _list_directory(self, directory: str, mtime_ns: int) -> dict:
+        """List matching files and sub-directories to descend into."""
+        files, dirs = [], []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in self.pruned_directories:
+                        dirs.append(entry.name)
+                elif entry.name.endswith(self.suffix):
+                    files.append(entry.name)
+        return {"mtime_ns": mtime_ns, "files": files, "dirs": dirs}
+
+    def _load_index(self, root: Path) -> dict[str, dict]:
+        """Read the persisted index, if it was built for root with the same filters."""
+        if self.index_path is None:
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if stored.get("settings") != self._settings(root):
+            return {}
+        return stored["directories"]
+
+    def _save_index(self, root: Path, index: dict[str, dict]) -> None:
+        """Persist the index, if an index path is set."""
+        if self.index_path is None:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": self._settings(root), "directories": index}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _settings(self, root: Path) -> dict:
+        """Parameters an index is only valid for."""
+        return {
+            "root": str(root),
+            "suffix": self.suffix,
+            "pruned": sorted(self.pruned_directories),
+        }
@@ -0,0 +1,147 @@
+"""Preprocessing fitted on a cohort, stored to transform new samples alike."""
+
+import copy
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .transformation import DEFAULT_ROW_BLOCK_SIZE, TransformationEngine
+
+
+class PreprocessingArtifact:
+    """Selected genes and fitted transformation of a generated dataset.
+
+    Applying it to new samples reproduces the columns and scaling of the dataset
+    without running feature selection nor fitting anything again.
+
+    Parameters
+    ----------
+    gene_ids : np.ndarray
+        Identifiers of the selected genes, in the column order of the dataset.
+    engine : TransformationEngine
+        Transformation engine fitted on the dataset.
+    dataset_fingerprint : str
+        Fingerprint of the dataset the preprocessing was fitted on.
+    """
+
+    def __init__(
+        self,
+        gene_ids: np.ndarray,
+        engine: TransformationEngine,
+        dataset_fingerprint: str,
+    ):
+        self.gene_ids = np.asarray(gene_ids, dtype=str)
+        self.engine = engine
+        self.dataset_fingerprint = dataset_fingerprint
+
+    def transform(
+        self,
+        new_matrix: pd.DataFrame | np.ndarray,
+        gene_ids: list[str] | None = None,
+        block_size: int = DEFAULT_ROW_BLOCK_SIZE,
+    ) -> pd.DataFrame | np.ndarray:
+        """Select and transform the genes of new samples, one block of rows at a
+        time.
+
+        Parameters
+        ----------
+        new_matrix : pd.DataFrame | np.ndarray
+            Raw counts of the new samples (samples x genes), with gene identifiers as
+            columns when given as a data frame. It is never modified.
+        gene_ids : list[str] | None, optional
+            Gene identifiers of the columns of an array, by default None (columns
+            already match `gene_ids` of the artifact)
+        block_size : int, optional
+            Number of samples transformed at once, by default DEFAULT_ROW_BLOCK_SIZE
+
+        Returns
+        -------
+        pd.DataFrame | np.ndarray
+            Transformed samples restricted to the selected genes, as a data frame
+            indexed like `new_matrix` if it is one.
+
+        Raises
+        ------
+        ValueError
+            If some selected genes are missing from the new samples.
+        """
+        index = None
+        if isinstance(new_matrix, pd.DataFrame):
+            index, gene_ids = new_matrix.index, new_matrix.columns
+            new_matrix = new_matrix.to_numpy()
+        columns = None
+        if gene_ids is not None:
+            columns = pd.Index(gene_ids).get_indexer(self.gene_ids)
+            if (columns < 0).any():
+                raise ValueError(
+                    f"{(columns < 0).sum()} selected genes are missing from the "
+                    "new samples"
+                )
+        elif new_matrix.shape[1] != len(self.gene_ids):
+            raise ValueError(
+                f"expected {len(self.gene_ids)} genes, got {new_matrix.shape[1]}"
+            )
+        else:
+            columns = np.arange(len(self.gene_ids))
+        engine = copy.copy(self.engine)
+        engine.block_size = block_size
+        transformed = engine.transform(new_matrix, columns, fit=False)
+        logging.info(
+            "transformed %i new samples over %i genes",
+            transformed.shape[0],
+            transformed.shape[1],
+        )
+        if index is None:
+            return transformed
+        return pd.DataFrame(transformed, index=index, columns=self.gene_ids)
+
+    def save(self, path: Path) -> None:
+        """Store the artifact as a `.npz` file.
+
+        Parameters
+        ----------
+        path : Path
+            Destination file.
+        """
+        parameters = {
+            "normalization": self.engine.normalization,
+            "log1p": self.engine.log1p,
+            "min_max": self.engine.min_max,
+            "dtype": str(self.engine.dtype),
+            "dataset_fingerprint": self.dataset_fingerprint,
+        }
+        arrays = {"gene_ids": self.gene_ids, "parameters": json.dumps(parameters)}
+        if self.engine.min_max:
+            arrays.update(scale=self.engine.scale, offset=self.engine.offset)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "PreprocessingArtifact":
+        """Read an artifact stored with `save`.
+
+        Parameters
+        ----------
+        path : Path
+            Artifact file.
+
+        Returns
+        -------
+        PreprocessingArtifact
+            Stored artifact.
+        """
+        with np.load(path) as arrays:
+            parameters = json.loads(str(arrays["parameters"]))
+            engine = TransformationEngine(
+                normalization=parameters["normalization"],
+                log1p=parameters["log1p"],
+                min_max=parameters["min_max"],
+                dtype=np.dtype(parameters["dtype"]),
+            )
+            if engine.min_max:
+                engine.scale, engine.offset = arrays["scale"], arrays["offset"]
+            return cls(arrays["gene_ids"], engine, parameters["dataset_fingerprint"])
@@ -0,0 +1,194 @@
+"""On-disk cache of the intermediate results of the dataset building stages."""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+MATRIX_FILE = "data.npy"
+SPARSE_MATRIX_FILE = "data.npz"
+STATE_FILE = "state.pkl"
+RECORD_FILE = "record.json"
+DEFAULT_STAGE_CACHE_BYTES = 20 * 2**30
+
+
+class StageCache:
+    """Content-addressed store of stage results, bounded in disk size.
+
+    Each stage result is stored in a directory named after its key, which hashes
+    the key of the upstream stage with the stage parameters, so that a change of
+    parameters invalidates the stage and every downstream one. Least recently used
+    results are evicted once the cache exceeds `max_bytes`. A result may be stored
+    without its matrix when the matrix is kept elsewhere, e.g. in the raw matrix
+    cache.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Directory holding the cached stages.
+    max_bytes : int, optional
+        Maximum size of the cache on disk, by default DEFAULT_STAGE_CACHE_BYTES
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_STAGE_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.evictions = 0
+
+    @staticmethod
+    def key(upstream_key: str, stage: str, parameters: dict) -> str:
+        """Cache key of a stage result.
+
+        Parameters
+        ----------
+        upstream_key : str
+            Key of the stage input.
+        stage : str
+            Name of the stage.
+        parameters : dict
+            Parameters the stage result depends on.
+
+        Returns
+        -------
+        str
+            Hex digest identifying the result.
+        """
+        payload = json.dumps(
+            [upstream_key, stage, parameters], sort_keys=True, default=str
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def load(
+        self, stage: str, key: str
+    ) -> tuple[np.ndarray | sp.csr_matrix | None, dict] | None:
+        """Read a stage result, marking it as recently used.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage, for the statistics.
+        key : str
+            Cache key.
+
+        Returns
+        -------
+        tuple[np.ndarray | sp.csr_matrix | None, dict] | None
+            Matrix (read-only memory-mapped when dense, None when stored without it)
+            and state of the builder, or None on cache miss.
+        """
+        path = self.cache_dir / key
+        if not (path / RECORD_FILE).exists():
+            self.misses[stage] += 1
+            return None
+        data_array = None
+        if (path / SPARSE_MATRIX_FILE).exists():
+            data_array = sp.load_npz(path / SPARSE_MATRIX_FILE).tocsr()
+        elif (path / MATRIX_FILE).exists():
+            data_array = np.load(path / MATRIX_FILE, mmap_mode="r")
+        with open(path / STATE_FILE, "rb") as f:
+            state = pickle.load(f)
+        os.utime(path / RECORD_FILE)
+        self.hits[stage] += 1
+        logging.info("%s stage cache hit %s", stage, key)
+        return data_array, state
+
+    def save(
+        self,
+        stage: str,
+        key: str,
+        data_array: np.ndarray | sp.csr_matrix | None,
+        state: dict,
+    ) -> None:
+        """Store a stage result, then evict old results beyond the size bound.
+
+        The record file is written last so that an interrupted save is a cache miss.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage.
+        key : str
+            Cache key.
+        data_array : np.ndarray | sp.csr_matrix | None
+            Matrix produced by the stage, None to store the state only.
+        state : dict
+            Picklable state of the builder accompanying the matrix.
+        """
+        path = self.cache_dir / key
+        tmp_path = self.cache_dir / (key + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        if sp.issparse(data_array):
+            sp.save_npz(tmp_path / SPARSE_MATRIX_FILE, data_array, compressed=False)
+        elif data_array is not None:
+            np.save(tmp_path / MATRIX_FILE, data_array)
+        with open(tmp_path / STATE_FILE, "wb") as f:
+            pickle.dump(state, f)
+        n_bytes = sum(p.stat().st_size for p in tmp_path.iterdir())
+        with open(tmp_path / RECORD_FILE, "w", encoding="utf-8") as f:
+            json.dump({"stage": stage, "key": key, "bytes": n_bytes}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        self.evict(keep=key)
+
+    def evict(self, keep: str | None = None) -> None:
+        """Remove least recently used results until the cache fits in max_bytes.
+
+        Parameters
+        ----------
+        keep : str | None, optional
+            Key of a result never to evict, by default None
+        """
+        records = sorted(self._records(), key=lambda record: record["last_used"])
+        total = sum(record["bytes"] for record in records)
+        for record in records:
+            if total <= self.max_bytes:
+                break
+            if record["key"] == keep:
+                continue
+            shutil.rmtree(self.cache_dir / record["key"], ignore_errors=True)
+            total -= record["bytes"]
+            self.evictions += 1
+            logging.info("evicted %s stage %s", record["stage"], record["key"])
+
+    def stats(self) -> dict:
+        """Statistics of the cache usage.
+
+        Returns
+        -------
+        dict
+            Hits and misses per stage, number of evictions, and number and total
+            size of the stored results.
+        """
+        records = self._records()
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "evictions": self.evictions,
+            "entries": len(records),
+            "bytes": sum(record["bytes"] for record in records),
+        }
+
+    def _records(self) -> list[dict]:
+        """Records of the stored results, with their last use time."""
+        if not self.cache_dir.exists():
+            return []
+        records = []
+        for record_path in self.cache_dir.glob(f"*/{RECORD_FILE}"):
+            try:
+                with open(record_path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+                record["last_used"] = record_path.stat().st_mtime_ns
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            records.append(record)
+        return records
@@ -0,0 +1,133 @@
+"""Feature transformations applied in place, one block of rows at a time."""
+
+import numpy as np
+
+DEFAULT_TRANSFORMATION_DTYPE = np.float32
+DEFAULT_ROW_BLOCK_SIZE = 256
+
+
+class TransformationEngine:
+    """Normalization, log(1 + x) and min-max scaling of a sample x gene matrix,
+    with at most one copy of it.
+
+    The matrix is converted to `dtype` (and its columns reordered) into a single
+    output array, unless it already is a writable array of that type in the right
+    order, in which case it is transformed in place. Row-wise steps are fused over
+    blocks of rows during that copy, the column extrema are accumulated along the
+    way, and min-max scaling takes a second pass. Results match `normalize`,
+    `np.log1p` and `MinMaxScaler(clip=True)` applied in sequence.
+
+    The fitted min-max parameters are kept in `scale` and `offset`, so that new
+    samples can be transformed alike in a single pass with `fit=False`.
+
+    Parameters
+    ----------
+    normalization : bool, optional
+        Whether to scale each sample to unit L2 norm, by default False
+    log1p : bool, optional
+        Whether to apply log(1 + x), by default True
+    min_max : bool, optional
+        Whether to scale each gene to [0, 1], by default True
+    dtype : np.dtype, optional
+        Type of the transformed matrix, by default DEFAULT_TRANSFORMATION_DTYPE
+    block_size : int, optional
+        Number of rows transformed at once, by default DEFAULT_ROW_BLOCK_SIZE
+    """
+
+    def __init__(
+        self,
+        normalization: bool = False,
+        log1p: bool = True,
+        min_max: bool = True,
+        dtype: np.dtype = DEFAULT_TRANSFORMATION_DTYPE,
+        block_size: int = DEFAULT_ROW_BLOCK_SIZE,
+    ):
+        self.normalization = normalization
+        self.log1p = log1p
+        self.min_max = min_max
+        self.dtype = np.dtype(dtype)
+        self.block_size = block_size
+        self.scale: np.ndarray | None = None
+        self.offset: np.ndarray | None = None
+
+    def transform(
+        self,
+        data_array: np.ndarray,
+        columns: np.ndarray | None = None,
+        fit: bool = True,
+    ) -> np.ndarray:
+        """Apply the enabled transformations.
+
+        Parameters
+        ----------
+        data_array : np.ndarray
+            Dense or memory-mapped matrix (samples x genes). It is modified when
+            transformed in place.
+        columns : np.ndarray | None, optional
+            Positional order of the output columns, by default None (unchanged)
+        fit : bool, optional
+            Whether to fit the min-max parameters on the data, rather than use the
+            previously fitted ones, by default True
+
+        Returns
+        -------
+        np.ndarray
+            Transformed matrix of type `dtype`.
+
+        Raises
+        ------
+        ValueError
+            If min-max scaling is applied without fitting before it was ever fitted.
+        """
+        if self.min_max and not fit and self.scale is None:
+            raise ValueError("min-max scaling is not fitted")
+        fit_min_max = self.min_max and fit
+        in_place = (
+            columns is None
+            and type(data_array) is np.ndarray
+            and data_array.dtype == self.dtype
+            and data_array.flags.writeable
+        )
+        n_columns = data_array.shape[1] if columns is None else len(columns)
+        if in_place:
+            out = data_array
+        else:
+            out = np.empty((data_array.shape[0], n_columns), dtype=self.dtype)
+        column_min = np.full(out.shape[1], np.inf, dtype=self.dtype)
+        column_max = np.full(out.shape[1], -np.inf, dtype=self.dtype)
+        for start in range(0, out.shape[0], self.block_size):
+            stop = min(start + self.block_size, out.shape[0])
+            block = out[start:stop]
+            if not in_place:
+                rows = data_array[start:stop]
+                block[:] = rows if columns is None else rows[:, columns]
+            self._transform_rows(block)
+            if fit_min_max:
+                np.minimum(column_min, block.min(axis=0), out=column_min)
+                np.maximum(column_max, block.max(axis=0), out=column_max)
+            elif self.min_max:
+                self._scale_rows(block)
+
+        if fit_min_max:
+            data_range = column_max - column_min
+            data_range[data_range == 0] = 1
+            self.scale = 1 / data_range
+            self.offset = -column_min * self.scale
+            for start in range(0, out.shape[0], self.block_size):
+                self._scale_rows(out[start : start + self.block_size])
+        return out
+
+    def _scale_rows(self, block: np.ndarray) -> None:
+        """Apply the fitted min-max scaling to a block of rows, in place."""
+        block *= self.scale
+        block += self.offset
+        np.clip(block, 0, 1, out=block)
+
+    def _transform_rows(self, block: np.ndarray) -> None:
+        """Apply the row-wise transformations to a block of rows, in place."""
+        if self.normalization:
+            norms = np.sqrt(np.einsum("ij,ij->i", block, block, dtype=np.float64))
+            norms[norms == 0] = 1
+            block /= norms[:, None].astype(self.dtype)
+        if self.log1p:
+            np.log1p(block, out=block)
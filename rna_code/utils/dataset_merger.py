@@ -10,6 +10,24 @@ class DatasetMerger():
         New Merged dataset
     """
 
+    @staticmethod
+    def common_features(dataset1 : pd.DataFrame, dataset2: pd.DataFrame) -> pd.Index:
+        """Features of both datasets, in the order of the first one.
+
+        Parameters
+        ----------
+        dataset1 : pd.DataFrame
+            First dataset
+        dataset2 : pd.DataFrame
+            Second dataset
+
+        Returns
+        -------
+        pd.Index
+            Common features
+        """
+        return dataset1.columns.intersection(dataset2.columns, sort=False)
+
     @staticmethod
     def intersect(dataset1 : pd.DataFrame, dataset2: pd.DataFrame) -> pd.DataFrame:
         """Merge two datasets by intersecting feature in common.
@@ -27,7 +45,7 @@ class DatasetMerger():
         pd.DataFrame
             Merged dataset
         """
-        feature_intersection = list(set(dataset1.columns) & set(dataset2.columns))
+        feature_intersection = DatasetMerger.common_features(dataset1, dataset2)
         return pd.concat([dataset1[feature_intersection], dataset2[feature_intersection]], axis = 0)
 
     @staticmethod
@@ -0,0 +1,301 @@
+"""Process resource usage helpers."""
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # optional, only needed where /proc is not available
+    psutil = None
+
+
+DEFAULT_SAMPLING_INTERVAL = 0.02
+
+
+def peak_rss_bytes(include_children: bool = False) -> int:
+    """Lifetime high-water mark of the resident set size of the current process.
+
+    This is the largest RSS since the process started, not the peak of the latest
+    operation: it does not move while memory stays below an earlier peak. Use
+    `RSSSampler` to measure the peak of a given step.
+
+    Parameters
+    ----------
+    include_children : bool, optional
+        Also consider terminated child processes (e.g. pool workers) and return the
+        largest peak, by default False
+
+    Returns
+    -------
+    int
+        Peak RSS in bytes, 0 when it cannot be measured on this platform.
+    """
+    if resource is None:
+        return 0
+    # ru_maxrss is in bytes on macOS, in kilobytes on Linux.
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * unit
+
+
+def current_rss_bytes() -> int:
+    """Current resident set size of the current process.
+
+    It is read from /proc on Linux, from psutil when it is installed, and from the
+    Mach `task_info` call on macOS.
+
+    Returns
+    -------
+    int
+        RSS in bytes, 0 when it cannot be measured on this platform.
+    """
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if sys.platform == "darwin":
+        return _mach_rss_bytes()
+    return 0
+
+
+class _MachTaskBasicInfo(ctypes.Structure):
+    """`mach_task_basic_info` of <mach/task_info.h>."""
+
+    _pack_ = 4
+    _fields_ = [
+        ("virtual_size", ctypes.c_uint64),
+        ("resident_size", ctypes.c_uint64),
+        ("resident_size_max", ctypes.c_uint64),
+        ("user_time", ctypes.c_int32 * 2),
+        ("system_time", ctypes.c_int32 * 2),
+        ("policy", ctypes.c_int32),
+        ("suspend_count", ctypes.c_int32),
+    ]
+
+
+_MACH_TASK_BASIC_INFO = 20
+_libc = None
+
+
+def _mach_rss_bytes() -> int:
+    """Resident size of the current task from `task_info`, 0 on failure."""
+    global _libc
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        task = ctypes.c_uint32.in_dll(_libc, "mach_task_self_")
+        info = _MachTaskBasicInfo()
+        count = ctypes.c_uint32(ctypes.sizeof(info) // 4)
+        status = _libc.task_info(
+            task, _MACH_TASK_BASIC_INFO, ctypes.byref(info), ctypes.byref(count)
+        )
+    except (OSError, AttributeError, ValueError):
+        return 0
+    return info.resident_size if status == 0 else 0
+
+
+def process_pool_context() -> multiprocessing.context.BaseContext:
+    """Start method of the process pools, which must not fork the caller.
+
+    `RSSSampler` runs a thread whenever a stage is profiled, and forking a process
+    that runs threads may deadlock in the child. Workers are therefore spawned, which
+    also keeps them children of the caller, so that `StageProfiler` accounts for
+    their CPU time once the pool is joined.
+
+    Returns
+    -------
+    multiprocessing.context.BaseContext
+        Context to pass as `mp_context` to `ProcessPoolExecutor`.
+    """
+    return multiprocessing.get_context("spawn")
+
+
+def cpu_seconds() -> float:
+    """CPU time of the current process and of its terminated, waited children.
+
+    Returns
+    -------
+    float
+        User and system CPU time in seconds.
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class RSSSampler:
+    """Peak RSS of the current process over a block, sampled in a thread.
+
+    Unlike the lifetime `peak_rss_bytes`, the peak is that of the enclosed block
+    only, whatever ran before it. Allocations shorter than the sampling interval
+    may be missed, and child processes are not accounted for.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Seconds between samples, by default DEFAULT_SAMPLING_INTERVAL
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLING_INTERVAL):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "RSSSampler":
+        """Start sampling."""
+        self.start_rss = self.peak_rss = current_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> int:
+        """Stop sampling.
+
+        Returns
+        -------
+        int
+            Peak RSS in bytes since `start`.
+        """
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss_bytes())
+        return self.peak_rss
+
+    def __enter__(self) -> "RSSSampler":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _sample(self) -> None:
+        """Record the largest RSS until stopped."""
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss_bytes())
+
+
+class StageProfiler:
+    """Wall time, CPU time, memory and matrix shapes of pipeline stages.
+
+    Stages are timed with the `stage` context manager and may be nested, a nested
+    stage being named after its parents (e.g. "raw/scan"). Each record holds:
+
+    - `rss_before_bytes` and `rss_after_bytes`, the current RSS around the stage;
+    - `peak_rss_bytes`, the peak RSS during the stage, sampled by `RSSSampler`;
+    - `peak_rss_growth_bytes`, the growth of the process lifetime high-water mark,
+      which is 0 whenever the stage stays below an earlier peak.
+
+    `cpu_seconds` includes the CPU time of the child processes joined during the
+    stage, such as the workers of a process pool, but their memory is not part of
+    the RSS figures.
+
+    Measures query the clocks, `getrusage` and /proc, plus a sampling thread per
+    running stage, so profiling is cheap enough to stay on.
+    """
+
+    def __init__(self):
+        self.records: list[dict] = []
+        self._stack: list[str] = []
+
+    @contextmanager
+    def stage(self, name: str, shape: Callable[[], tuple] | None = None):
+        """Profile the enclosed block as a stage.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage.
+        shape : Callable[[], tuple] | None, optional
+            Returns the (rows, genes) shape of the data the stage works on, either
+            possibly None, called on entry and exit, by default None
+
+        Yields
+        ------
+        dict
+            Record of the stage, filled on exit.
+        """
+        self._stack.append(name)
+        record = {"stage": "/".join(self._stack)}
+        self.records.append(record)
+        rows_in, genes_in = _shape_or_none(shape)
+        lifetime_peak = peak_rss_bytes()
+        sampler = RSSSampler().start()
+        wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = cpu_seconds() - cpu_start
+            record["rss_before_bytes"] = sampler.start_rss
+            record["peak_rss_bytes"] = sampler.stop()
+            record["rss_after_bytes"] = current_rss_bytes()
+            record["peak_rss_growth_bytes"] = peak_rss_bytes() - lifetime_peak
+            rows_out, genes_out = _shape_or_none(shape)
+            record.update(
+                rows_in=rows_in,
+                genes_in=genes_in,
+                rows_out=rows_out,
+                genes_out=genes_out,
+            )
+            self._stack.pop()
+            logging.debug(
+                "%s took %.2fs (%.2fs CPU), peak RSS %.1f MiB",
+                record["stage"],
+                record["wall_seconds"],
+                record["cpu_seconds"],
+                record["peak_rss_bytes"] / 2**20,
+            )
+
+    def report(self) -> dict:
+        """Report of the profiled stages.
+
+        Returns
+        -------
+        dict
+            Records of the stages in order of entry, and lifetime peak RSS of the
+            process.
+        """
+        return {"stages": self.records, "peak_rss_bytes": peak_rss_bytes()}
+
+    def save(self, path: Path) -> None:
+        """Write the report as JSON.
+
+        Parameters
+        ----------
+        path : Path
+            Destination file.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=2), encoding="utf-8")
+
+
+def _shape_or_none(shape: Callable[[], tuple] | None) -> tuple:
+    """Shape returned by `shape`, (None, None) when it is not available yet."""
+    if shape is None:
+        return None, None
+    try:
+        rows, genes = shape()
+    except AttributeError:
+        return None, None
+    return tuple(None if size is None else int(size) for size in (rows, genes))
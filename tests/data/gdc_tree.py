@@ -0,0 +1,62 @@
+"""Helpers writing small synthetic GDC download trees for tests."""
+
+from pathlib import Path
+
+import numpy as np
+
+GENE_TYPES = ["protein_coding", "lncRNA", "miRNA"]
+
+
+def write_star_counts(path: Path, gene_ids: list[str], counts: np.ndarray) -> None:
+    """Write an `augmented_star_gene_counts.tsv` file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    columns = [
+        "gene_id", "gene_name", "gene_type", "unstranded", "stranded_first",
+        "stranded_second", "tpm_unstranded", "fpkm_unstranded", "fpkm_uq_unstranded",
+    ]
+    lines = ["# gene-model: GENCODE v36", "\t".join(columns)]
+    for summary in ["N_unmapped", "N_multimapping", "N_noFeature", "N_ambiguous"]:
+        lines.append("\t".join([summary, "", "", "10", "10", "10", "", "", ""]))
+    for i, (gene_id, count) in enumerate(zip(gene_ids, counts)):
+        lines.append(
+            "\t".join(
+                [
+                    gene_id,
+                    f"GENE{gene_id[-3:]}",
+                    GENE_TYPES[i % len(GENE_TYPES)],
+                    str(int(count)),
+                    str(int(count) // 2),
+                    str(int(count) - int(count) // 2),
+                    f"{count / 7:.4f}",
+                    f"{count / 11:.4f}",
+                    f"{count / 13:.4f}",
+                ]
+            )
+        )
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def make_gdc_tree(
+    root: Path, n_samples: int = 6, n_genes: int = 40, seed: int = 0
+) -> tuple[list[Path], np.ndarray]:
+    """Write `n_samples` count files, one per UUID-like directory, with logs.
+
+    Returns
+    -------
+    tuple[list[Path], np.ndarray]
+        Sorted count files and the matching count matrix.
+    """
+    rng = np.random.default_rng(seed)
+    gene_ids = [f"ENSG{i:011d}.{i % 5 + 1}" for i in range(n_genes)]
+    counts = rng.poisson(3, size=(n_samples, n_genes)) * rng.integers(
+        0, 2, size=(n_samples, n_genes)
+    )
+    entries = []
+    for i in range(n_samples):
+        sample_dir = root / f"{i:08x}-0000-0000-0000-000000000000"
+        path = sample_dir / f"sample{i}.rna_seq.augmented_star_gene_counts.tsv"
+        write_star_counts(path, gene_ids, counts[i])
+        (sample_dir / "logs").mkdir(parents=True, exist_ok=True)
+        (sample_dir / "logs" / "star.log").write_text("log", encoding="utf-8")
+        entries.append(path)
+    return sorted(entries), counts.astype(float)
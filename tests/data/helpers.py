@@ -0,0 +1,35 @@
+"""Synthetic count matrices and fixtures shared by the data tests."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+def count_matrix(
+    n_samples: int = 30,
+    n_genes: int = 200,
+    seed: int = 0,
+    density: float | None = 0.4,
+) -> np.ndarray:
+    """Negative binomial counts with dropouts, as float32.
+
+    `density` is the fraction of non-zero counts, drawn for every gene when None.
+    """
+    rng = np.random.default_rng(seed)
+    counts = rng.negative_binomial(2, 0.05, size=(n_samples, n_genes))
+    dropouts = rng.random((n_samples, n_genes))
+    counts *= dropouts < (rng.random(n_genes) if density is None else density)
+    return counts.astype(np.float32)
+
+
+class TemporaryDirectoryTestCase(unittest.TestCase):
+    """Test case with a fresh temporary directory in `tmp_path`."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
@@ -0,0 +1,79 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from rna_code.data.interface.annotation_store import GeneAnnotationStore
+from rna_code.data.interface.base_interface import BaseInterface
+
+
+class StubFetcher:
+    """Local stand-in for mygene, recording the IDs it is asked for."""
+
+    def __init__(self, annotations: pd.DataFrame):
+        self.annotations = annotations
+        self.calls: list[list[str]] = []
+
+    def __call__(self, queries: list[str]) -> pd.DataFrame:
+        self.calls.append(queries)
+        return self.annotations[self.annotations["query"].isin(queries)]
+
+
+class TestGeneAnnotationStore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_import_and_offline_lookup(self):
+        dump = self.root / "genes.json"
+        dump.write_text(
+            json.dumps(
+                [
+                    {
+                        "query": "ENSG00000000003",
+                        "symbol": "TSPAN6",
+                        "genomic_pos": {"chr": "X", "start": 100, "end": 200, "strand": -1},
+                    },
+                    {
+                        "_id": "ENSG00000000005.6",
+                        "symbol": "TNMD",
+                        "genomic_pos": [{"chr": "X", "start": 300, "end": 400, "strand": 1}],
+                    },
+                ]
+            ),
+            encoding="utf-8",
+        )
+        store = GeneAnnotationStore(self.root / "store.sqlite")
+        self.assertEqual(store.import_file(dump), 2)
+
+        names = pd.DataFrame({"gene_id": ["ENSG00000000005.6", "ENSG00000000003.15", "ENSG00000000419.13"]})
+        names["query"] = ["ENSG00000000005", "ENSG00000000003", "ENSG00000000419"]
+        result = BaseInterface.retrieve_position(names, drop_na=True, store=store)
+        self.assertListEqual(list(result["query"]), list(names["query"]))
+        self.assertListEqual(list(result["name"]), ["TNMD", "TSPAN6", "ENSG00000000419"])
+        self.assertEqual(result["genomic_pos.start"].iloc[0], 300)
+
+    def test_fallback_fetches_misses_once(self):
+        fetcher = StubFetcher(
+            pd.DataFrame(
+                {"query": ["ENSG00000000003"], "symbol": ["TSPAN6"], "genomic_pos.chr": ["X"]}
+            )
+        )
+        store = GeneAnnotationStore(self.root / "store.sqlite", fetcher=fetcher)
+        queries = pd.Series(["ENSG00000000003", "ENSG00000000419"])
+        first = store.lookup(queries)
+        second = store.lookup(queries)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(len(fetcher.calls), 1)
+        self.assertEqual(first["symbol"].iloc[0], "TSPAN6")
+        self.assertTrue(pd.isna(first["symbol"].iloc[1]))
+        self.assertEqual(len(store), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
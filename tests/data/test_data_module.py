@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from rna_code.data.data_module.brca_data_module import BRCADataModule
+from rna_code.data.data_module.cptac_3_data_module import CPTAC3DataModule
+from rna_code.data.dataset_store import save_dataset
+
+
+class TestDataModule(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self._tmp.name)
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame(
+            rng.random((20, 8), dtype=np.float32),
+            index=[f"sample-{i}" for i in range(20)],
+        )
+        save_dataset(self.data_dir / "BRCA_data.npy", self.df)
+        pd.DataFrame({"case": range(20)}, index=self.df.index).to_csv(
+            self.data_dir / "meta_data.csv"
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_data_modules_read_app_outputs(self):
+        save_dataset(self.data_dir / "CPTAC_3_data.npy", self.df)
+        pd.DataFrame({"case": range(20)}, index=self.df.index).to_csv(
+            self.data_dir / "CPTAC_3_meta_data.csv"
+        )
+        for data_module_class in [BRCADataModule, CPTAC3DataModule]:
+            data_module = data_module_class(data_param={"Path": self.data_dir})
+            data_module.setup("fit")
+            self.assertEqual(data_module.default_metadata_path.suffix, ".csv")
+            self.assertListEqual(
+                list(data_module.meta_data.index), list(self.df.index)
+            )
+            np.testing.assert_array_equal(data_module.data_array, self.df.to_numpy())
+
+    def test_memory_mapped_matrix_is_not_copied(self):
+        data_module = BRCADataModule(data_param={"Path": self.data_dir})
+        data_module.setup("fit")
+        self.assertIsInstance(data_module.data_array, np.memmap)
+        data_tensor = data_module.full_dataset.tensors[0]
+        self.assertEqual(data_tensor.data_ptr(), data_module.data_array.ctypes.data)
+        np.testing.assert_array_equal(data_tensor.numpy(), self.df.to_numpy())
+        self.assertEqual(data_module.feature_num, 8)
+        self.assertEqual(len(data_module.train_dataset), 16)
+
+    def test_in_memory_loading(self):
+        data_module = BRCADataModule(
+            data_param={"Path": self.data_dir, "mmap_mode": None}
+        )
+        data_module.setup("fit")
+        self.assertNotIsInstance(data_module.data_array, np.memmap)
+        np.testing.assert_array_equal(
+            data_module.full_dataset.tensors[0].numpy(), self.df.to_numpy()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
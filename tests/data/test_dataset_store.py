@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from rna_code.data.dataset_store import (
+    export_csv,
+    load_dataset,
+    load_dataset_array,
+    save_dataset,
+)
+
+
+class TestDatasetStore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "data" / "BRCA_data.npy"
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame(
+            rng.random((5, 4), dtype=np.float32),
+            index=[f"sample-{i}" for i in range(5)],
+            columns=[f"ENSG{i:011d}.1" for i in range(4)],
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip_is_lossless(self):
+        save_dataset(self.path, self.df)
+        pd.testing.assert_frame_equal(load_dataset(self.path), self.df)
+        data_array = load_dataset_array(self.path, mmap_mode="r")
+        self.assertIsInstance(data_array, np.memmap)
+        np.testing.assert_array_equal(data_array, self.df.to_numpy())
+
+    def test_csv_export(self):
+        save_dataset(self.path, self.df)
+        csv_path = self.path.with_suffix(".csv")
+        export_csv(self.path, csv_path)
+        df = pd.read_csv(csv_path, index_col=0)
+        np.testing.assert_allclose(df.to_numpy(), self.df.to_numpy(), rtol=1e-6)
+        self.assertListEqual(list(df.columns), list(self.df.columns))
+
+
+if __name__ == "__main__":
+    unittest.main()
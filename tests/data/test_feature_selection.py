@@ -0,0 +1,297 @@
+import unittest
+
+import numpy as np
+import scipy
+import scipy.sparse as sp
+from sklearn.linear_model import SGDClassifier
+
+from rna_code.data.feature_selection.base_feature_selector import (
+    ScoreBasedSelector,
+    top_k_mask,
+)
+from rna_code.data.feature_selection.expression_selector import ExpressionSelector
+from rna_code.data.feature_selection.laplacian_selector import LaplacianSelector
+from rna_code.data.feature_selection.lasso_selector import (
+    LassoSelector,
+    balanced_indices,
+)
+from rna_code.data.feature_selection.mad_selector import MADSelector
+from rna_code.data.feature_selection.score_cache import ScoreCache, matrix_fingerprint
+
+from helpers import TemporaryDirectoryTestCase, count_matrix
+
+
+class TestSparseSelection(unittest.TestCase):
+    def setUp(self):
+        self.dense = count_matrix()
+        self.sparse = sp.csr_matrix(self.dense)
+
+    def test_expression_selector(self):
+        dense_selector = ExpressionSelector(threshold=0.5)
+        sparse_selector = ExpressionSelector(threshold=0.5)
+        self.assertListEqual(
+            list(dense_selector.select_features(self.dense)),
+            list(sparse_selector.select_features(self.sparse)),
+        )
+        np.testing.assert_array_equal(dense_selector.scores, sparse_selector.scores)
+
+    def test_mad_selector(self):
+        dense_selector = MADSelector(threshold=1)
+        sparse_selector = MADSelector(threshold=1)
+        self.assertListEqual(
+            list(dense_selector.select_features(self.dense)),
+            list(sparse_selector.select_features(self.sparse)),
+        )
+        np.testing.assert_array_equal(dense_selector.scores, sparse_selector.scores)
+
+    def test_laplacian_selector(self):
+        dense_selector = LaplacianSelector(threshold=0.002)
+        sparse_selector = LaplacianSelector(threshold=0.002)
+        dense_selector.select_features(self.dense)
+        sparse_selector.select_features(self.sparse)
+        np.testing.assert_allclose(
+            dense_selector.scores, sparse_selector.scores, rtol=1e-6
+        )
+
+
+class TestBlockwiseSelection(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dense = count_matrix(n_genes=500)
+        path = self.tmp_path / "matrix.npy"
+        np.save(path, self.dense)
+        self.memmap = np.load(path, mmap_mode="r")
+
+    def tearDown(self):
+        del self.memmap
+        super().tearDown()
+
+    def test_mad_matches_scipy(self):
+        selector = MADSelector(threshold=1, block_size=64, n_jobs=3)
+        selector.select_features(self.memmap)
+        np.testing.assert_allclose(
+            selector.scores, scipy.stats.median_abs_deviation(self.dense)
+        )
+
+    def test_block_settings_do_not_change_scores(self):
+        for selector_class, kwargs in [
+            (ExpressionSelector, {"threshold": 0.5}),
+            (MADSelector, {"threshold": 1}),
+            (LaplacianSelector, {"threshold": 0.002}),
+        ]:
+            reference = selector_class(**kwargs)
+            reference.select_features(self.dense)
+            blockwise = selector_class(**kwargs, block_size=37, n_jobs=4)
+            blockwise.select_features(self.memmap)
+            np.testing.assert_allclose(blockwise.scores, reference.scores, rtol=1e-10)
+
+
+class TestScoreCache(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ScoreCache(self.tmp_path)
+        self.X = np.log1p(count_matrix())
+
+    def test_fingerprint(self):
+        self.assertEqual(matrix_fingerprint(self.X), matrix_fingerprint(self.X.copy()))
+        self.assertEqual(
+            matrix_fingerprint(sp.csr_matrix(self.X)),
+            matrix_fingerprint(sp.csc_matrix(self.X)),
+        )
+        changed = self.X.copy()
+        changed[3, 7] += 1
+        self.assertNotEqual(matrix_fingerprint(self.X), matrix_fingerprint(changed))
+
+    def test_scores_are_reused(self):
+        first = LaplacianSelector(threshold=0.002)
+        first.score_cache = self.cache
+        first.select_features(self.X)
+        second = LaplacianSelector(threshold=0.01)
+        second.score_cache = self.cache
+        second.compute_scores = None  # a cache hit must not recompute scores
+        second.select_features(self.X)
+        np.testing.assert_array_equal(second.scores, first.scores)
+
+        other_k = LaplacianSelector(threshold=0.002, k=3)
+        other_k.score_cache = self.cache
+        other_k.select_features(self.X)
+        self.assertFalse(np.array_equal(other_k.scores, first.scores))
+        self.assertEqual(len(list(self.tmp_path.glob("*.npy"))), 2)
+
+    def test_sweep(self):
+        thresholds = [0.5, 1, 2, 5]
+        selector = MADSelector(threshold=1)
+        masks, counts = selector.sweep(self.X, thresholds=thresholds)
+        self.assertEqual(masks.shape, (len(thresholds), self.X.shape[1]))
+        for threshold, mask, count in zip(thresholds, masks, counts):
+            single = MADSelector(threshold=threshold).select_features(self.X)
+            np.testing.assert_array_equal(mask, single)
+            self.assertEqual(count, single.sum())
+        masks, counts = selector.sweep(self.X, n_features=[10, 20])
+        self.assertListEqual(list(counts), [10, 20])
+
+
+class TestTopKSelection(unittest.TestCase):
+    def setUp(self):
+        self.X = np.log1p(count_matrix(n_genes=400))
+
+    def test_top_k_mask(self):
+        scores = np.array([0.3, np.nan, 5.0, 1.0, 2.0, 4.0])
+        mask = top_k_mask(scores, 2, np.isfinite(scores))
+        self.assertListEqual(list(np.flatnonzero(mask)), [2, 5])
+        self.assertEqual(top_k_mask(scores, 10, np.isfinite(scores)).sum(), 5)
+        self.assertEqual(top_k_mask(scores, 0).sum(), 0)
+
+    def test_every_selector_keeps_the_best_features(self):
+        for selector_class in [ExpressionSelector, MADSelector, LaplacianSelector]:
+            selector = selector_class(n_features=50)
+            selection = selector.select_features(self.X)
+            self.assertIsInstance(selection, np.ndarray)
+            self.assertEqual(selection.sum(), 50)
+            admissible = selector._admissible(selector.scores)
+            scores = np.where(admissible, selector.scores, -np.inf)
+            self.assertGreaterEqual(
+                scores[selection].min(), np.sort(scores)[-50], selector_class.__name__
+            )
+
+    def test_mad_keeps_the_most_variable_genes(self):
+        selector = MADSelector(n_features=10, ceiling=1000)
+        selection = selector.select_features(self.X)
+        self.assertGreaterEqual(
+            selector.scores[selection].min(), selector.scores[~selection].max()
+        )
+
+
+class TestScoreBasedSelector(unittest.TestCase):
+    def test_score_hooks_are_abstract(self):
+        class Incomplete(ScoreBasedSelector):
+            def select_features(self, data_array, **kwargs):
+                return np.ones(data_array.shape[1], dtype=bool)
+
+        with self.assertRaises(TypeError):
+            Incomplete(threshold=0)
+        self.assertFalse(issubclass(LassoSelector, ScoreBasedSelector))
+        self.assertFalse(hasattr(LassoSelector, "sweep"))
+
+
+class TestLassoSelector(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.labels = np.repeat(["a", "b"], 40)
+        self.X = rng.normal(size=(80, 30))
+        self.X[self.labels == "b", :3] += 2
+
+    def test_regularization_path(self):
+        sgdc_params = {"l1_ratio": [0.5, 1.0], "alpha": np.linspace(0.01, 0.5, 8)}
+        selector = LassoSelector(
+            self.labels,
+            sgdc_params=sgdc_params,
+            search="path",
+            n_jobs=2,
+            patience=2,
+            random_state=0,
+        )
+        selection = selector.select_features(self.X)
+        self.assertTrue(selection[:3].all())
+        self.assertLess(selection.sum(), self.X.shape[1])
+        results = selector.path_results
+        self.assertLessEqual(len(results), 2 * 8)
+        self.assertListEqual(
+            list(results.columns),
+            ["l1_ratio", "alpha", "score", "n_nonzero", "seconds"],
+        )
+        self.assertTrue((results["seconds"] > 0).all())
+        for _, path in results.groupby("l1_ratio"):
+            self.assertTrue((np.diff(path["alpha"]) < 0).all())
+
+    def test_stability_selection(self):
+        sgdc_params = {"l1_ratio": [1.0], "alpha": [0.05, 0.1]}
+        selector = LassoSelector(
+            self.labels,
+            sgdc_params=sgdc_params,
+            class_balancing="match_smaller_sample",
+            search="path",
+            n_jobs=2,
+            n_resamples=12,
+            random_state=0,
+        )
+        selection = selector.select_features(self.X)
+        self.assertEqual(selector.scores.shape, (self.X.shape[1],))
+        self.assertTrue(((selector.scores >= 0) & (selector.scores <= 1)).all())
+        self.assertGreaterEqual(selector.scores[:3].min(), 0.9)
+        self.assertTrue(selection[:3].all())
+
+    def test_balanced_indices(self):
+        labels = np.array(["a"] * 7 + ["b"] * 3 + ["c"] * 5)
+        rows = balanced_indices(labels, rng=0)
+        self.assertEqual(len(set(rows)), 9)
+        self.assertListEqual(list(labels[rows]), ["a"] * 3 + ["b"] * 3 + ["c"] * 3)
+        rows = balanced_indices(labels, 2, np.random.default_rng(1))
+        self.assertListEqual(list(labels[rows]), ["a"] * 2 + ["b"] * 2 + ["c"] * 2)
+        for n_per_class in [0, 4]:
+            with self.assertRaises(ValueError):
+                balanced_indices(labels, n_per_class)
+
+    def test_stability_selection_with_a_tiny_class(self):
+        labels = np.array(["a"] * 40 + ["b"] * 3)
+        X = np.random.default_rng(0).normal(size=(43, 10))
+        X[labels == "b", 0] += 4
+        selector = LassoSelector(
+            labels,
+            class_balancing="match_smaller_sample",
+            n_jobs=1,
+            n_resamples=2,
+            sample_fraction=0.2,
+            random_state=0,
+        )
+        estimator = SGDClassifier(loss="log_loss", penalty="l1", alpha=0.01)
+        scores = selector.stability_selection(X, estimator)
+        self.assertEqual(scores.shape, (10,))
+
+
+class TestLaplacianScore(unittest.TestCase):
+    def test_matches_per_feature_loop(self):
+        X = np.log1p(count_matrix(n_genes=2500)).astype(np.float64)
+        selector = LaplacianSelector(threshold=0.002)
+        W = selector.affinity(X)
+        D = np.diag(W.sum(axis=1))
+        D_inverse_sqrt = np.diag(1 / np.sqrt(np.diag(D)))
+        S = D_inverse_sqrt @ (D - W) @ D_inverse_sqrt
+        expected = []
+        for i in range(X.shape[1]):
+            f = X[:, i] - X[:, i].mean()
+            expected.append(f @ S @ f / (f @ D @ f))
+        before = X.copy()
+        np.testing.assert_allclose(selector.laplacian_score(X), expected, rtol=1e-10)
+        np.testing.assert_array_equal(X, before)
+
+    def test_knn_graph_matches_dense_when_complete(self):
+        X = np.log1p(count_matrix())
+        k = X.shape[0] - 1
+        dense_scores = LaplacianSelector(threshold=0.002, k=k).laplacian_score(X)
+        knn_selector = LaplacianSelector(threshold=0.002, k=k, graph="knn")
+        self.assertTrue(sp.issparse(knn_selector.affinity(X)))
+        np.testing.assert_allclose(
+            knn_selector.laplacian_score(X), dense_scores, rtol=1e-5
+        )
+
+    def test_knn_graph_is_sparse(self):
+        X = np.log1p(count_matrix(n_samples=200))
+        selector = LaplacianSelector(threshold=0.002, k=5, graph="knn")
+        W = selector.affinity(sp.csr_matrix(X))
+        self.assertLessEqual(W.nnz, 200 * (2 * 5 + 1))
+        np.testing.assert_allclose((W - W.T).toarray(), 0)
+        scores = selector.laplacian_score(X)
+        self.assertEqual(scores.shape, (X.shape[1],))
+
+    def test_subsampled_sigma(self):
+        X = np.log1p(count_matrix(n_samples=200))
+        full = LaplacianSelector(threshold=0.002, graph="knn").laplacian_score(X)
+        estimate = LaplacianSelector(
+            threshold=0.002, graph="knn", sigma_samples=100
+        ).laplacian_score(X)
+        np.testing.assert_allclose(estimate, full, rtol=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import scipy
+import scipy.sparse as sp
+
+from rna_code.data.dataset_builder import DatasetBuilder
+from rna_code.data.feature_selection.base_feature_selector import (
+    for_each_column_block,
+)
+from rna_code.data.feature_selection.expression_selector import ExpressionSelector
+from rna_code.data.feature_selection.feature_statistics import feature_statistics
+from rna_code.data.feature_selection.hvg_selector import HVGSelector
+from rna_code.data.feature_selection.laplacian_selector import LaplacianSelector
+from rna_code.data.feature_selection.mad_selector import MADSelector
+
+from helpers import TemporaryDirectoryTestCase, count_matrix
+
+
+class TestFeatureStatistics(unittest.TestCase):
+    def test_statistics(self):
+        X = count_matrix(n_genes=300, density=None)
+        for data_array in [X, sp.csr_matrix(X)]:
+            statistics = feature_statistics(data_array, block_size=64, n_jobs=2)
+            np.testing.assert_array_equal(
+                statistics["nonzero_fraction"], np.count_nonzero(X, axis=0) / len(X)
+            )
+            np.testing.assert_array_equal(statistics["median"], np.median(X, axis=0))
+            np.testing.assert_allclose(
+                statistics["mad"], scipy.stats.median_abs_deviation(X)
+            )
+            np.testing.assert_allclose(statistics["mean"], X.mean(axis=0, dtype=float))
+            np.testing.assert_allclose(
+                statistics["variance"], X.var(axis=0, ddof=1, dtype=float)
+            )
+
+
+class TestHVGSelector(unittest.TestCase):
+    def test_selects_overdispersed_genes(self):
+        rng = np.random.default_rng(0)
+        X = rng.poisson(rng.uniform(10, 20, size=400), size=(100, 400)).astype(float)
+        p = 1 / (1 + X[:, :5].mean(axis=0))
+        X[:, :5] = rng.negative_binomial(1, p, size=(100, 5))
+        X[:, 10] = 0
+        selector = HVGSelector(n_features=5, block_size=32, n_jobs=2)
+        selection = selector.select_features(X)
+        self.assertTrue(np.isnan(selector.scores[10]))
+        self.assertListEqual(list(np.flatnonzero(selection)), list(range(5)))
+        self.assertEqual(HVGSelector(threshold=3).select_features(X).sum(), 5)
+
+
+class TestFusedSelection(TemporaryDirectoryTestCase):
+    def _builder(
+        self, X: np.ndarray, sparse: bool = False, hvg_threshold: float | None = None
+    ) -> DatasetBuilder:
+        builder = DatasetBuilder(
+            "CPTAC-3",
+            selection_thresholds={
+                "expression_threshold": 0.6,
+                "HVG_threshold": hvg_threshold,
+                "LS_threshold": 0.002,
+                "MAD_threshold": 1,
+            },
+        )
+        builder.data_array = sp.csr_matrix(X) if sparse else X
+        builder.names = pd.DataFrame({"gene_id": [f"G{i}" for i in range(X.shape[1])]})
+        return builder
+
+    def test_matches_sequential_selection(self):
+        X = count_matrix(n_genes=300, density=None)
+        expected = X
+        names = np.array([f"G{i}" for i in range(X.shape[1])])
+        for selector in [
+            ExpressionSelector(threshold=0.6),
+            LaplacianSelector(threshold=0.002),
+            MADSelector(threshold=1),
+        ]:
+            gene_selected = selector.select_features(expected)
+            expected, names = expected[:, gene_selected], names[gene_selected]
+        self.assertGreater(len(names), 0)
+        self.assertLess(len(names), X.shape[1])
+
+        for sparse in [False, True]:
+            builder = self._builder(X, sparse)
+            builder._feature_selection()
+            np.testing.assert_array_equal(builder.data_array, expected)
+            self.assertListEqual(list(builder.names["gene_id"]), list(names))
+
+    def test_hvg_prefilter_matches_sequential_selection(self):
+        X = count_matrix(n_genes=300, density=None)
+        expected = X
+        for selector in [
+            ExpressionSelector(threshold=0.6),
+            HVGSelector(threshold=0),
+            LaplacianSelector(threshold=0.002),
+            MADSelector(threshold=1),
+        ]:
+            expected = expected[:, selector.select_features(expected)]
+        builder = self._builder(X, hvg_threshold=0)
+        builder._feature_selection()
+        np.testing.assert_allclose(builder.data_array, expected)
+
+    def test_keep_only_protein_coding(self):
+        X = count_matrix(n_genes=300, density=None)
+        builder = DatasetBuilder(
+            "CPTAC-3",
+            selection_thresholds={"LS_threshold": None, "MAD_threshold": None},
+            additional_processing_steps={"keep_only_protein_coding": True},
+        )
+        builder.data_array = X
+        gene_type = np.where(np.arange(X.shape[1]) % 3, "lncRNA", "protein_coding")
+        builder.names = pd.DataFrame({"gene_type": gene_type})
+        builder._feature_selection()
+        np.testing.assert_array_equal(builder.data_array, X[:, ::3])
+
+    def test_statistics_cached_across_thresholds(self):
+        X = count_matrix(n_genes=300, density=None)
+        with mock.patch(
+            "rna_code.data.dataset_builder.SCORE_CACHE_PATH", self.tmp_path
+        ), mock.patch(
+            "rna_code.data.feature_selection.feature_statistics.for_each_column_block",
+            wraps=for_each_column_block,
+        ) as statistics_pass:
+            selected = []
+            for mad_threshold in [1, 10]:
+                builder = DatasetBuilder(
+                    "CPTAC-3",
+                    selection_thresholds={
+                        "LS_threshold": None,
+                        "MAD_threshold": mad_threshold,
+                    },
+                    additional_processing_steps={"score_cache": True},
+                )
+                builder.data_array = X
+                builder.names = pd.DataFrame({"gene_id": range(X.shape[1])})
+                builder._feature_selection()
+                selected.append(builder.data_array.shape[1])
+        self.assertEqual(statistics_pass.call_count, 1)
+        self.assertGreater(selected[0], selected[1])
+        expected = X[:, MADSelector(threshold=10).select_features(X)]
+        np.testing.assert_array_equal(builder.data_array, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from rna_code.data.dataset_builder import DatasetBuilder
+from rna_code.data.interface.annotation_store import fetch_mygene
+from rna_code.data.interface.gdc_interface import GDCInterface
+
+from gdc_tree import GENE_TYPES, make_gdc_tree
+
+
+class TestGDCInterface(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.data_path = root / "TCGA-LUAD"
+        self.entries, self.counts = make_gdc_tree(self.data_path)
+        self.metadata_path = root / "metadata.json"
+        self.metadata_path.write_text("[]", encoding="utf-8")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_new_project_is_configuration(self):
+        interface = GDCInterface(
+            self.data_path, self.metadata_path, retrieve_positions=False, cache_dir=None
+        )
+        interface.n_workers = 1
+        interface.setup()
+        np.testing.assert_array_equal(interface.data_array, self.counts)
+        self.assertListEqual(
+            interface.entry_names, [e.parent.name for e in self.entries]
+        )
+        self.assertListEqual(
+            list(interface.names.columns), ["gene_id", "gene_name", "gene_type"]
+        )
+        self.assertEqual(interface.names["gene_type"].iloc[1], GENE_TYPES[1])
+        self.assertListEqual(interface.subtypes, [])
+
+    def test_unknown_project(self):
+        with self.assertRaises(NotImplementedError):
+            GDCInterface.from_project("TCGA-UNKNOWN")
+
+    def test_project_overrides(self):
+        interface = GDCInterface.from_project(
+            "BRCA", data_path=self.data_path, cache_dir=None
+        )
+        self.assertEqual(interface.data_path, self.data_path)
+        self.assertIsNotNone(interface.subtypes_table)
+
+    def test_offline_annotation(self):
+        keys = []
+        for annotation_fetcher in [fetch_mygene, None]:
+            interface = GDCInterface(
+                self.data_path,
+                self.metadata_path,
+                cache_dir=None,
+                annotation_fetcher=annotation_fetcher,
+            )
+            self.assertIs(interface.annotation_store.fetcher, annotation_fetcher)
+            interface.annotation_store.path = Path(self._tmp.name) / "store.sqlite"
+            keys.append(interface.source_key())
+        self.assertNotEqual(*keys)
+        builder = DatasetBuilder("BRCA", additional_processing_steps={"offline": True})
+        self.assertIsNone(builder.data_interface.annotation_store.fetcher)
+
+
+if __name__ == "__main__":
+    unittest.main()
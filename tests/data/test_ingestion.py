@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from rna_code.data.interface.base_interface import BaseInterface
+from rna_code.data.interface.ingestion import IngestionEngine, gene_fingerprint
+from rna_code.utils.resources import current_rss_bytes
+
+from gdc_tree import make_gdc_tree, write_star_counts
+
+
+class TestIngestionEngine(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.entries, self.counts = make_gdc_tree(Path(self._tmp.name))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_matches_serial_loading(self):
+        expected = np.array(
+            [BaseInterface.load_patient_data(e, header=5) for e in self.entries]
+        )
+        for n_workers in [1, 2]:
+            data_array = IngestionEngine(n_workers=n_workers).load(self.entries)
+            self.assertEqual(data_array.dtype, np.float32)
+            np.testing.assert_array_equal(data_array, expected)
+
+    def test_sparse_output(self):
+        data_array = IngestionEngine(n_workers=2, sparse=True).load(self.entries)
+        self.assertEqual(data_array.format, "csr")
+        self.assertEqual(data_array.nnz, np.count_nonzero(self.counts))
+        np.testing.assert_array_equal(data_array.toarray(), self.counts)
+
+    def test_disk_backed_output(self):
+        out_path = Path(self._tmp.name) / "matrix.npy"
+        data_array = IngestionEngine(n_workers=1, dtype=np.float64).load(
+            self.entries, out_path=out_path
+        )
+        self.assertIsInstance(data_array, np.memmap)
+        np.testing.assert_array_equal(np.load(out_path), self.counts)
+
+    def test_reports_throughput(self):
+        engine = IngestionEngine(n_workers=1)
+        engine.load(self.entries)
+        self.assertGreater(engine.files_per_second, 0)
+
+    @unittest.skipUnless(current_rss_bytes(), "RSS is not measurable on this platform")
+    def test_reports_memory(self):
+        engine = IngestionEngine(n_workers=1)
+        engine.load(self.entries)
+        self.assertGreater(engine.peak_rss, 0)
+
+    def test_realigns_shuffled_gene_order(self):
+        gene_ids = [f"ENSG{i:011d}.{i % 5 + 1}" for i in range(self.counts.shape[1])]
+        order = np.random.default_rng(1).permutation(len(gene_ids))
+        write_star_counts(
+            self.entries[2], [gene_ids[i] for i in order], self.counts[2][order]
+        )
+        engine = IngestionEngine(n_workers=2)
+        data_array = engine.load(self.entries)
+        np.testing.assert_array_equal(data_array, self.counts)
+        self.assertListEqual(engine.realigned, [self.entries[2]])
+        self.assertListEqual(list(engine.gene_ids), gene_ids)
+        self.assertEqual(engine.fingerprints[0], gene_fingerprint(gene_ids))
+        self.assertNotEqual(engine.fingerprints[2], engine.fingerprints[0])
+
+    def test_missing_genes_are_zero(self):
+        gene_ids = [f"ENSG{i:011d}.{i % 5 + 1}" for i in range(self.counts.shape[1])]
+        write_star_counts(self.entries[1], gene_ids[1:], self.counts[1][1:])
+        data_array = IngestionEngine(n_workers=1).load(self.entries)
+        self.assertEqual(data_array[1, 0], 0)
+        np.testing.assert_array_equal(data_array[1, 1:], self.counts[1][1:])
+
+
+if __name__ == "__main__":
+    unittest.main()
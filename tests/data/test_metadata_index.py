@@ -0,0 +1,64 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from rna_code.data.interface.brca_interface import BRCAInterface
+from rna_code.data.interface.metadata_index import MetadataIndex
+
+
+def cart_record(file_name: str, submitter_id: str) -> dict:
+    return {
+        "file_name": file_name,
+        "file_id": f"id-{file_name}",
+        "associated_entities": [
+            {"entity_submitter_id": submitter_id, "case_id": "c", "entity_id": "e"}
+        ],
+    }
+
+
+class TestMetadataIndex(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.metadata_path = self.root / "metadata.json"
+        records = [
+            cart_record("a.augmented_star_gene_counts.tsv", "TCGA-AA-0001-01A"),
+            cart_record("b.augmented_star_gene_counts.tsv", "TCGA-AA-0002-01A"),
+        ]
+        self.metadata_path.write_text(json.dumps(records), encoding="utf-8")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_persisted_lookup(self):
+        index_path = self.root / "index.csv"
+        built = MetadataIndex.load(self.metadata_path, index_path)
+        reloaded = MetadataIndex.load(self.metadata_path, index_path)
+        self.assertTrue(built.table.equals(reloaded.table))
+        self.assertEqual(
+            reloaded["b.augmented_star_gene_counts"]["file_id"],
+            "id-b.augmented_star_gene_counts.tsv",
+        )
+        table = reloaded.lookup(["b.augmented_star_gene_counts", "missing"])
+        self.assertEqual(table["entity_submitter_id"].iloc[0], "TCGA-AA-0002-01A")
+        self.assertTrue(table.iloc[1].isna().all())
+
+    def test_find_subtypes(self):
+        subtypes_path = self.root / "subtypes.tsv"
+        subtypes_path.write_text(
+            "patient,subtype\nTCGA-AA-0002,LumA\nTCGA-AA-0003,Basal\n", encoding="utf-8"
+        )
+        interface = BRCAInterface(self.root, self.metadata_path, cache_dir=None)
+        interface.subtypes_table = subtypes_path
+        interface.entries = [
+            self.root / "x" / "b.augmented_star_gene_counts.tsv",
+            self.root / "y" / "a.augmented_star_gene_counts.tsv",
+        ]
+        interface._load_metadata()
+        interface.find_subtypes()
+        self.assertListEqual(interface.subtypes, ["LumA", "Unknown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
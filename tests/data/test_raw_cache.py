@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from rna_code.data.interface.cptac_3_interface import CPTAC3Interface
+from rna_code.data.interface.raw_cache import RawMatrixCache
+
+from gdc_tree import make_gdc_tree, write_star_counts
+
+
+class TestRawMatrixCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.data_path = root / "CPTAC-3"
+        self.entries, self.counts = make_gdc_tree(self.data_path)
+        self.metadata_path = root / "metadata.json"
+        self.metadata_path.write_text("[]", encoding="utf-8")
+        self.cache_dir = root / "cache"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _setup_interface(self, sparse: bool = False) -> CPTAC3Interface:
+        interface = CPTAC3Interface(self.data_path, self.metadata_path, self.cache_dir)
+        interface.n_workers = 1
+        interface.sparse = sparse
+        interface.setup()
+        return interface
+
+    def test_cache_hit_is_memory_mapped(self):
+        first = self._setup_interface()
+        second = self._setup_interface()
+        self.assertIsInstance(second.data_array, np.memmap)
+        np.testing.assert_array_equal(second.data_array, first.data_array)
+        self.assertListEqual(
+            list(second.names["gene_id"]), list(first.names["gene_id"])
+        )
+
+    def test_cache_invalidates_on_changes(self):
+        self._setup_interface()
+        stat = os.stat(self.entries[0])
+        os.utime(self.entries[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        touched = self._setup_interface()
+        self.assertNotIsInstance(touched.data_array, np.memmap)
+        gene_ids = list(touched.names["gene_id"])
+        new_counts = np.arange(len(gene_ids))
+        write_star_counts(
+            self.data_path / "ffffffff" / "new.augmented_star_gene_counts.tsv",
+            gene_ids,
+            new_counts,
+        )
+        interface = self._setup_interface()
+        self.assertNotIsInstance(interface.data_array, np.memmap)
+        np.testing.assert_array_equal(interface.data_array[-1], new_counts)
+
+    def test_incremental_update(self):
+        self._setup_interface()
+        self.entries[1].unlink()
+        gene_ids = [f"ENSG{i:011d}.{i % 5 + 1}" for i in range(self.counts.shape[1])]
+        new_counts = np.arange(len(gene_ids))
+        write_star_counts(
+            self.data_path / "00000000-new" / "new.augmented_star_gene_counts.tsv",
+            gene_ids,
+            new_counts,
+        )
+        interface = CPTAC3Interface(self.data_path, self.metadata_path, self.cache_dir)
+        interface.n_workers = 1
+        interface.incremental = True
+        interface.setup()
+        self.assertIsInstance(interface.data_array, np.memmap)
+        expected = np.vstack([self.counts[:1], new_counts, self.counts[2:]])
+        np.testing.assert_array_equal(interface.data_array, expected)
+        fingerprints = RawMatrixCache(interface.cache_dir).stored_fingerprints()
+        self.assertEqual(len(fingerprints), len(expected))
+        self.assertEqual(len(set(fingerprints)), 1)
+        self.assertIsInstance(self._setup_interface().data_array, np.memmap)
+
+    def test_sparse_incremental_update(self):
+        self._setup_interface(sparse=True)
+        self.entries[0].unlink()
+        interface = CPTAC3Interface(self.data_path, self.metadata_path, self.cache_dir)
+        interface.n_workers = 1
+        interface.sparse = True
+        interface.incremental = True
+        interface.setup()
+        self.assertEqual(interface.data_array.format, "csr")
+        np.testing.assert_array_equal(interface.data_array.toarray(), self.counts[1:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from rna_code.data.interface.scanner import EntryScanner
+
+from gdc_tree import make_gdc_tree
+
+
+class TestEntryScanner(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name) / "BRCA"
+        self.entries, _ = make_gdc_tree(self.root)
+        (self.root / "logs").mkdir()
+        (self.root / "logs" / "old.augmented_star_gene_counts.tsv").touch()
+        (self.root / "MANIFEST.txt").touch()
+        self.index_path = Path(self._tmp.name) / "index.json"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_matches_rglob(self):
+        expected = sorted(
+            path
+            for path in self.root.rglob("*")
+            if str(path).endswith("augmented_star_gene_counts.tsv")
+            and "logs" not in path.parts
+        )
+        self.assertListEqual(EntryScanner().scan(self.root), expected)
+
+    def test_index_tracks_changes(self):
+        scanner = EntryScanner(index_path=self.index_path)
+        self.assertListEqual(scanner.scan(self.root), self.entries)
+        self.assertListEqual(scanner.scan(self.root), self.entries)
+
+        self.entries[0].unlink()
+        new_entry = self.entries[1].parent / "b.augmented_star_gene_counts.tsv"
+        new_entry.touch()
+        for directory in [self.entries[0].parent, new_entry.parent]:
+            os.utime(directory, ns=(0, os.stat(directory).st_mtime_ns + 10**9))
+        self.assertListEqual(
+            scanner.scan(self.root), sorted(self.entries[1:] + [new_entry])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
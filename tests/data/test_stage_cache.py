@@ -0,0 +1,149 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from rna_code.data.dataset_builder import DatasetBuilder
+from rna_code.data.interface.annotation_store import GeneAnnotationStore
+from rna_code.data.interface.gdc_interface import GDCInterface
+from rna_code.data.stage_cache import StageCache
+
+from gdc_tree import make_gdc_tree
+
+
+class TestStageCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip_and_stats(self):
+        cache = StageCache(self.cache_dir)
+        key = cache.key("upstream", "selection", {"MAD_threshold": 1})
+        other_key = cache.key("upstream", "selection", {"MAD_threshold": 2})
+        self.assertNotEqual(key, other_key)
+        self.assertIsNone(cache.load("selection", key))
+        data_array = np.arange(12.0).reshape(3, 4)
+        cache.save("selection", key, data_array, {"names": ["a", "b"]})
+        loaded, state = cache.load("selection", key)
+        np.testing.assert_array_equal(loaded, data_array)
+        self.assertDictEqual(state, {"names": ["a", "b"]})
+        stats = cache.stats()
+        self.assertDictEqual(stats["hits"], {"selection": 1})
+        self.assertDictEqual(stats["misses"], {"selection": 1})
+        self.assertEqual(stats["entries"], 1)
+
+    def test_evicts_least_recently_used(self):
+        data_array = np.zeros((100, 100))
+        cache = StageCache(self.cache_dir, max_bytes=2.5 * data_array.nbytes)
+        for key in ["a", "b"]:
+            cache.save("raw", key, data_array, {})
+        self.assertIsNotNone(cache.load("raw", "a"))
+        cache.save("raw", "c", data_array, {})
+        self.assertIsNone(cache.load("raw", "b"))
+        self.assertIsNotNone(cache.load("raw", "a"))
+        self.assertIsNotNone(cache.load("raw", "c"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_state_only_result(self):
+        cache = StageCache(self.cache_dir)
+        cache.save("raw", "a", None, {"names": ["a"]})
+        self.assertEqual(list((self.cache_dir / "a").glob("data.np*")), [])
+        self.assertEqual(cache.load("raw", "a"), (None, {"names": ["a"]}))
+
+
+class TestStageResume(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.data_path = root / "CPTAC-3"
+        make_gdc_tree(self.data_path, n_samples=12, n_genes=60)
+        self.metadata_path = root / "metadata.json"
+        self.metadata_path.write_text("[]", encoding="utf-8")
+        self.cache = StageCache(root / "stages")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _generate(
+        self,
+        min_max: bool,
+        cached: bool = True,
+        builder_list: list | None = None,
+        cache_dir: Path | None = None,
+    ) -> pd.DataFrame:
+        builder = DatasetBuilder(
+            "CPTAC-3",
+            selection_thresholds={"LS_threshold": None, "MAD_threshold": 0.5},
+            additional_processing_steps={"min_max": min_max},
+        )
+        builder.data_interface = GDCInterface(
+            self.data_path,
+            self.metadata_path,
+            retrieve_positions=False,
+            cache_dir=cache_dir,
+        )
+        builder.data_interface.n_workers = 1
+        if cached:
+            builder.stage_cache = self.cache
+        if builder_list is not None:
+            builder_list.append(builder)
+        return builder.generate_dataset()[0]
+
+    def test_resumes_from_deepest_cached_stage(self):
+        builders = []
+        self._generate(min_max=True, builder_list=builders)
+        records = {r["stage"]: r for r in builders[0].profiler.records}
+        self.assertIn("raw/scan", records)
+        self.assertEqual(records["raw/matrix"]["genes_out"], 60)
+        self.assertEqual(records["selection/statistics"]["rows_in"], 12)
+        self.assertEqual(
+            records["transformation"]["genes_in"], records["selection"]["genes_out"]
+        )
+        self.assertDictEqual(self.cache.stats()["hits"], {})
+        with mock.patch.object(DatasetBuilder, "_feature_selection") as selection:
+            df = self._generate(min_max=False)
+        selection.assert_not_called()
+        self.assertDictEqual(self.cache.stats()["hits"], {"selection": 1})
+        pd.testing.assert_frame_equal(df, self._generate(min_max=False, cached=False))
+
+        with mock.patch.object(DatasetBuilder, "_feature_transformation") as step:
+            df = self._generate(min_max=True)
+        step.assert_not_called()
+        self.assertEqual(self.cache.stats()["hits"]["transformation"], 1)
+        pd.testing.assert_frame_equal(df, self._generate(min_max=True, cached=False))
+
+    def test_raw_stage_references_raw_matrix_cache(self):
+        raw_cache_dir = Path(self._tmp.name) / "raw"
+        self._generate(min_max=True, cache_dir=raw_cache_dir)
+        self.assertEqual(self.cache.stats()["entries"], 3)
+        downstream = list(self.cache.cache_dir.glob("*/data.npy"))
+        self.assertEqual(len(downstream), 2)
+        for path in downstream:
+            shutil.rmtree(path.parent)
+        with mock.patch.object(GDCInterface, "setup") as setup:
+            df = self._generate(min_max=False, cache_dir=raw_cache_dir)
+        setup.assert_not_called()
+        self.assertEqual(self.cache.stats()["hits"]["raw"], 1)
+        pd.testing.assert_frame_equal(df, self._generate(min_max=False, cached=False))
+
+    def test_source_key_follows_annotation_store(self):
+        store = GeneAnnotationStore(Path(self._tmp.name) / "annotations.sqlite")
+        interface = GDCInterface(
+            self.data_path, self.metadata_path, retrieve_positions=True, cache_dir=None
+        )
+        interface.annotation_store = store
+        key = interface.source_key()
+        self.assertEqual(interface.source_key(), key)
+        store.insert(pd.DataFrame({"query": ["ENSG0"], "symbol": ["A"]}))
+        self.assertNotEqual(interface.source_key(), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
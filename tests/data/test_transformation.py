@@ -0,0 +1,134 @@
+import itertools
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler, normalize
+
+from rna_code.data.dataset_builder import DatasetBuilder
+from rna_code.data.preprocessing_artifact import PreprocessingArtifact
+from rna_code.data.transformation import (
+    DEFAULT_ROW_BLOCK_SIZE,
+    TransformationEngine,
+)
+
+
+def reference_transformation(X, normalization, log1p, min_max):
+    """Transformations as applied step by step before the engine."""
+    if normalization:
+        X = normalize(X)
+    if log1p:
+        X = np.log1p(X)
+    if min_max:
+        X = MinMaxScaler(feature_range=(0, 1), clip=True).fit_transform(X)
+    return X
+
+
+class TestTransformationEngine(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = rng.negative_binomial(2, 0.05, size=(70, 30)).astype(np.float64)
+        self.X[:, 3] = 5
+        self.X[4] = 0
+
+    def test_matches_reference_pipeline(self):
+        for steps in itertools.product([False, True], repeat=3):
+            expected = reference_transformation(self.X, *steps)
+            for dtype, rtol in [(np.float64, 1e-12), (np.float32, 1e-5)]:
+                engine = TransformationEngine(*steps, dtype=dtype, block_size=16)
+                result = engine.transform(self.X.copy())
+                self.assertEqual(result.dtype, dtype)
+                np.testing.assert_allclose(result, expected, rtol=rtol, atol=rtol)
+
+    def test_in_place_and_column_order(self):
+        engine = TransformationEngine(normalization=True, dtype=np.float64)
+        expected = reference_transformation(self.X, True, True, True)
+        X = self.X.copy()
+        self.assertIs(engine.transform(X), X)
+        np.testing.assert_allclose(X, expected)
+
+        columns = np.random.default_rng(1).permutation(self.X.shape[1])
+        read_only = self.X.copy()
+        read_only.flags.writeable = False
+        result = engine.transform(read_only, columns)
+        np.testing.assert_allclose(result, expected[:, columns])
+        np.testing.assert_array_equal(read_only, self.X)
+
+    def test_sort_symbols_uses_positions(self):
+        builder = DatasetBuilder(
+            "CPTAC-3",
+            additional_processing_steps={"sort_symbols": True, "log1p": False},
+        )
+        builder.data_array = np.array([[1.0, 2.0, 3.0], [4.0, 8.0, 6.0]])
+        builder.names = pd.DataFrame(
+            {
+                "gene_id": ["a", "b", "c"],
+                "genomic_pos.chr": ["2", "1", "1"],
+                "genomic_pos.start": [5, 9, 1],
+            },
+            index=[10, 4, 7],
+        )
+        builder._feature_transformation()
+        self.assertListEqual(list(builder.names["gene_id"]), ["c", "b", "a"])
+        np.testing.assert_allclose(builder.data_array, [[0, 0, 0], [1, 1, 1]])
+        self.assertEqual(builder.data_array.dtype, np.float32)
+
+    def test_builder_keeps_raw_matrix(self):
+        builder = DatasetBuilder(
+            "CPTAC-3",
+            selection_thresholds={
+                "MAD_threshold": None,
+                "LS_threshold": None,
+                "expression_threshold": None,
+                "HVG_threshold": None,
+            },
+            additional_processing_steps={"keep_only_protein_coding": False},
+        )
+        raw_array = self.X.astype(np.float32)
+        builder.data_interface = mock.Mock(
+            data_array=raw_array,
+            names=pd.DataFrame({"gene_id": [f"g{i}" for i in range(30)]}),
+            meta_data=pd.DataFrame(index=range(70)),
+            subtypes=None,
+            entry_names=[f"s{i}" for i in range(70)],
+        )
+        df = builder.generate_dataset()[0]
+        np.testing.assert_array_equal(raw_array, self.X)
+        pd.testing.assert_frame_equal(builder.generate_dataset()[0], df)
+
+
+class TestPreprocessingArtifact(unittest.TestCase):
+    def test_new_samples_transform_like_the_cohort(self):
+        rng = np.random.default_rng(0)
+        X = rng.negative_binomial(2, 0.05, size=(60, 20)).astype(np.float32)
+        selected = np.array([7, 2, 11, 5])
+        engine = TransformationEngine(normalization=True)
+        transformed = engine.transform(X, selected)
+        artifact = PreprocessingArtifact(
+            np.array([f"G{i}" for i in selected]), engine, "fingerprint"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "preprocessing.npz"
+            artifact.save(path)
+            artifact = PreprocessingArtifact.load(path)
+        self.assertEqual(artifact.dataset_fingerprint, "fingerprint")
+
+        new_samples = pd.DataFrame(
+            X[:25, ::-1], columns=[f"G{i}" for i in range(20)][::-1]
+        )
+        result = artifact.transform(new_samples, block_size=8)
+        self.assertEqual(artifact.engine.block_size, DEFAULT_ROW_BLOCK_SIZE)
+        self.assertListEqual(list(result.columns), ["G7", "G2", "G11", "G5"])
+        np.testing.assert_allclose(result.to_numpy(), transformed[:25], rtol=1e-6)
+        np.testing.assert_allclose(
+            artifact.transform(X[25:, selected]), transformed[25:], rtol=1e-6
+        )
+        with self.assertRaises(ValueError):
+            artifact.transform(new_samples.drop(columns="G7"))
+
+
+if __name__ == "__main__":
+    unittest.main()
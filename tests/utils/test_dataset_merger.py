@@ -16,6 +16,13 @@ class TestDatasetMerger(unittest.TestCase):
         merged_df = DatasetMerger.intersect(dataset_1, dataset_2)
         pd.testing.assert_frame_equal(merged_df, pd.DataFrame(data={"a": [1,2,1,2]}, index = [0,1,0,1]))
 
+    def test_common_features_keep_first_order(self):
+
+        dataset_1 = pd.DataFrame(columns=["c", "a", "b", "d"])
+        dataset_2 = pd.DataFrame(columns=["a", "b", "c"])
+        features = DatasetMerger.common_features(dataset_1, dataset_2)
+        self.assertListEqual(list(features), ["c", "a", "b"])
+
     def test_union_dataset(self):
 
         dataset_1 = pd.DataFrame(data = {
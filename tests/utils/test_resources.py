@@ -0,0 +1,95 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from rna_code.utils import resources
+from rna_code.utils.resources import (
+    RSSSampler,
+    StageProfiler,
+    current_rss_bytes,
+    peak_rss_bytes,
+    process_pool_context,
+)
+
+RSS_MEASURABLE = current_rss_bytes() > 0
+
+
+class TestCurrentRSS(unittest.TestCase):
+    def test_falls_back_without_proc(self):
+        process = SimpleNamespace(memory_info=lambda: SimpleNamespace(rss=1234))
+        with mock.patch.object(resources, "open", side_effect=OSError, create=True):
+            with mock.patch.object(resources, "psutil", None):
+                with mock.patch.object(resources.sys, "platform", "win32"):
+                    self.assertEqual(current_rss_bytes(), 0)
+            with mock.patch.object(
+                resources, "psutil", SimpleNamespace(Process=lambda: process)
+            ):
+                self.assertEqual(current_rss_bytes(), 1234)
+
+
+class TestProcessPoolContext(unittest.TestCase):
+    def test_pools_do_not_fork(self):
+        # pools are started while RSSSampler threads run
+        self.assertNotEqual(process_pool_context().get_start_method(), "fork")
+
+
+@unittest.skipUnless(RSS_MEASURABLE, "RSS is not measurable on this platform")
+class TestRSSSampler(unittest.TestCase):
+    def test_peak_below_lifetime_peak(self):
+        earlier = np.ones(2**25)  # 256 MiB
+        del earlier
+        lifetime_peak = peak_rss_bytes()
+        with RSSSampler(interval=0.001) as sampler:
+            block = np.ones(2**23)  # 64 MiB
+        del block
+        self.assertEqual(peak_rss_bytes(), lifetime_peak)
+        self.assertGreater(sampler.peak_rss - sampler.start_rss, 2**25)
+
+
+@unittest.skipUnless(RSS_MEASURABLE, "RSS is not measurable on this platform")
+class TestStageProfiler(unittest.TestCase):
+    def test_nested_stages_report(self):
+        profiler = StageProfiler()
+        data = SimpleNamespace()
+        with profiler.stage("build", lambda: data.array.shape):
+            with profiler.stage("load"):
+                data.array = np.ones((3000, 4000))  # 92 MiB
+            data.array = data.array[:, :50]
+        build, load = profiler.records
+        self.assertEqual(load["stage"], "build/load")
+        self.assertEqual((build["rows_in"], build["genes_in"]), (None, None))
+        self.assertEqual((build["rows_out"], build["genes_out"]), (3000, 50))
+        self.assertGreaterEqual(build["wall_seconds"], load["wall_seconds"])
+        self.assertGreaterEqual(build["peak_rss_growth_bytes"], 0)
+        self.assertGreater(load["peak_rss_bytes"] - load["rss_before_bytes"], 2**25)
+        self.assertGreater(build["peak_rss_bytes"] - build["rss_before_bytes"], 2**25)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "report.json"
+            profiler.save(path)
+            report = json.loads(path.read_text(encoding="utf-8"))
+        self.assertListEqual(
+            [record["stage"] for record in report["stages"]], ["build", "build/load"]
+        )
+
+
+class TestStageCPU(unittest.TestCase):
+    def test_counts_pool_workers(self):
+        profiler = StageProfiler()
+        with profiler.stage("ingestion"):
+            start = time.process_time()
+            with ProcessPoolExecutor(2, mp_context=process_pool_context()) as executor:
+                list(executor.map(sum, [range(10**7)] * 2))
+            parent_cpu = time.process_time() - start
+        self.assertGreater(profiler.records[0]["cpu_seconds"], parent_cpu + 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()